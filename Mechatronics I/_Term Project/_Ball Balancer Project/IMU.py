@@ -10,13 +10,81 @@
 
 
 import struct
+import array
 import pyb
+import utime
 
 ## @brief Establishes clock line pin on CPU
 SCL = pyb.Pin(pyb.Pin.cpu.B8)
 ## @brief Establishes data line pin on CPU
 SDA = pyb.Pin(pyb.Pin.cpu.B9)
 
+## @brief First register of the burst read, GYR_DATA_X_LSB
+BURST_REG = 0x14
+## @brief Index of gyro x in the burst, the 0x14 to 0x1F block holds gyro x, y, z then Euler heading, roll, pitch
+OMG_X = 0
+## @brief Index of gyro y in the burst
+OMG_Y = 1
+## @brief Index of gyro z in the burst
+OMG_Z = 2
+## @brief Index of the Euler heading in the burst
+EUL_H = 3
+## @brief Index of the Euler roll in the burst
+EUL_R = 4
+## @brief Index of the Euler pitch in the burst
+EUL_P = 5
+## @brief Number of 16 bit values in the burst
+BURST_SIZE = 6
+
+## @brief Operating mode register value of CONFIG mode, the sensor configuration can only be changed in it
+MODE_CONFIG = 0x00
+## @brief Operating mode register value of the non-fusion accelerometer and gyro mode
+MODE_ACCGYRO = 0x05
+## @brief Operating mode register value of the non-fusion accelerometer, magnetometer and gyro mode
+MODE_AMG = 0x07
+## @brief Operating mode register value of the NDOF fusion mode
+MODE_NDOF = 0x0C
+## @brief Register selecting register page 0 or 1, the sensor configuration is on page 1
+PAGE_ID = 0x07
+## @brief Page 1 accelerometer configuration register
+ACC_CONFIG = 0x08
+## @brief Page 1 gyro configuration register
+GYR_CONFIG_0 = 0x0A
+## @brief Accelerometer configuration of the raw mode, normal power, 125 Hz bandwidth, +-4 g
+ACC_CONFIG_RAW = 0x11
+## @brief Gyro configuration of the raw mode, 116 Hz bandwidth at 1 kHz output rate, +-500 deg/s
+GYR_CONFIG_RAW = 0x12
+## @brief Period in us of the gyro output with GYR_CONFIG_RAW
+RAW_PERIOD_US = 1000
+
+## @brief First register of the raw motion burst, ACC_DATA_X_LSB, the 0x08 to 0x19 block holds accelerometer,
+#         magnetometer and gyro x, y, z
+MOTION_REG = 0x08
+## @brief Index of accelerometer x in the motion burst, 100 counts per m/s^2
+ACC_X = 0
+## @brief Index of accelerometer y in the motion burst
+ACC_Y = 1
+## @brief Index of accelerometer z in the motion burst
+ACC_Z = 2
+## @brief Index of gyro x in the motion burst, 16 counts per deg/s
+GYR_X = 6
+## @brief Index of gyro y in the motion burst
+GYR_Y = 7
+## @brief Index of gyro z in the motion burst
+GYR_Z = 8
+## @brief Number of 16 bit values in the motion burst
+MOTION_SIZE = 9
+
+## @brief Period in us of the fused output in NDOF mode, 100 Hz
+FUSION_PERIOD_US = 10000
+## @brief How much earlier than one output period after the last new sample readIfDue() polls again, in us
+EARLY_US = 1000
+## @brief Delay in us before polling again after a read returned the previous sample
+RETRY_US = 1000
+## @brief Reads in a row returning the previous sample after which it is taken as new, a platform at rest can give
+#         identical registers
+MAX_MISSES = 3
+
 
 class BNO055:
     ''' @brief                  BNO055 IMU class
@@ -32,8 +100,24 @@ class BNO055:
         self.addr = addr
         ## @brief Communication for BNO055
         self.i2c = i2c
+        ## @brief Preallocated buffer the burst read lands in, its little endian int16 items are the register values
+        self.raw = array.array('h', [0]*BURST_SIZE)
+        ## @brief Preallocated buffer of the raw motion burst of readMotion()
+        self.motion = array.array('h', [0]*MOTION_SIZE)
+        ## @brief Register values of the last new sample, compared with every read to tell if the device has updated
+        self.last = array.array('h', [0]*BURST_SIZE)
+        ## @brief Output period of the device in us
+        self.period_us = FUSION_PERIOD_US
+        ## @brief ticks_us time from which readIfDue() reads the device again
+        self.t_due = utime.ticks_us()
+        ## @brief Reads in a row that returned the previous sample
+        self.misses = 0
+        ## @brief Number of readIfDue() calls that read the device
+        self.reads = 0
+        ## @brief Number of readIfDue() calls answered from the cache without a transaction
+        self.cached = 0
         #Change to NDOF mode
-        self.changeMode(0x0C)
+        self.changeMode(MODE_NDOF)
         
     def changeMode(self, data):
         ''' @brief Changes mode on BNO055
@@ -104,6 +188,112 @@ class BNO055:
         omg_vals = tuple(omg_int/16 for omg_int in omg_signed_ints)
         return omg_vals
         
+    def readRaw(self):
+        ''' @brief Reads gyro and Euler registers in one I2C transaction
+            @details Reads the 12 contiguous bytes from GYR_DATA_X_LSB (0x14) to EUL_PITCH_MSB (0x1F) straight into
+                     a preallocated array('h'). The registers are little endian int16 like the STM32, so the array
+                     items are the decoded values and nothing is unpacked or allocated.
+            @return The raw array indexed by OMG_X to EUL_P, 16 counts per deg/s and per deg, overwritten by the
+                    next read
+        '''
+        self.i2c.mem_read(self.raw, self.addr, BURST_REG)
+        return self.raw
+    
+    def readInto(self, out, scale=1/16):
+        ''' @brief Reads gyro and Euler data in one I2C transaction into the caller's array
+            @param out Array of at least BURST_SIZE floats indexed by OMG_X to EUL_P
+            @param scale Factor applied to the raw counts, 1/16 gives deg/s and deg
+        '''
+        raw = self.readRaw()
+        for i in range(BURST_SIZE):
+            out[i] = raw[i]*scale
+    
+    def setRawMode(self, mode=MODE_ACCGYRO, acc_config=ACC_CONFIG_RAW, gyr_config=GYR_CONFIG_RAW,
+                   period_us=RAW_PERIOD_US):
+        ''' @brief Switches to a non-fusion mode with a faster gyro
+            @details The sensor configuration is only writable in CONFIG mode and lives on register page 1, so the
+                     device goes to CONFIG mode, page 1 is written and page 0 selected again before the new mode is
+                     set. The waits are the mode switching times of the datasheet. The calibration offsets written
+                     in NDOF mode stay applied to the raw data.
+            @param mode MODE_ACCGYRO or MODE_AMG
+            @param acc_config Value of the ACC_CONFIG register
+            @param gyr_config Value of the GYR_CONFIG_0 register
+            @param period_us Gyro output period in us that goes with gyr_config
+        '''
+        self.changeMode(MODE_CONFIG)
+        utime.sleep_ms(20)
+        self.i2c.mem_write(1, self.addr, PAGE_ID)
+        self.i2c.mem_write(acc_config, self.addr, ACC_CONFIG)
+        self.i2c.mem_write(gyr_config, self.addr, GYR_CONFIG_0)
+        self.i2c.mem_write(0, self.addr, PAGE_ID)
+        self.changeMode(mode)
+        utime.sleep_ms(8)
+        self.setOutputPeriod(period_us)
+    
+    def readMotion(self):
+        ''' @brief Reads accelerometer, magnetometer and gyro registers in one I2C transaction
+            @details Reads the 18 contiguous bytes from ACC_DATA_X_LSB (0x08) to GYR_DATA_Z_MSB (0x19) into a
+                     preallocated array('h'), the raw mode counterpart of readRaw(). The magnetometer values read 0
+                     in MODE_ACCGYRO.
+            @return The raw array indexed by ACC_X to GYR_Z, overwritten by the next read
+        '''
+        self.i2c.mem_read(self.motion, self.addr, MOTION_REG)
+        return self.motion
+    
+    def setOutputPeriod(self, period_us):
+        ''' @brief Sets the output period readIfDue() paces its reads to
+            @param period_us Period in us at which the device produces new data in its current mode
+        '''
+        self.period_us = period_us
+    
+    def readIfDue(self, out, scale=1/16, align=True):
+        ''' @brief Reads gyro and Euler data only once the device can have a new sample
+            @details Until one output period has passed since the last new sample no transaction is made and out
+                     keeps the cached values. With align set the read is due EARLY_US before that, and a read that
+                     returns the previous sample is repeated after RETRY_US, so the reads lock onto the moment the
+                     device updates its registers instead of drifting against it. Without align reads are made on a
+                     fixed grid of the output period.
+            @param out Array of at least BURST_SIZE floats indexed by OMG_X to EUL_P, left unchanged when no new
+                       sample was read
+            @param scale Factor applied to the raw counts, 1/16 gives deg/s and deg
+            @param align True to align the reads to the device's update times
+            @return True when out holds a new sample
+        '''
+        now = utime.ticks_us()
+        if utime.ticks_diff(now, self.t_due) < 0:
+            self.cached += 1
+            return False
+        self.reads += 1
+        raw = self.readRaw()
+        last = self.last
+        if not align:
+            self.t_due = utime.ticks_add(self.t_due, self.period_us)
+            if utime.ticks_diff(now, self.t_due) >= 0:
+                # fell more than a period behind, restart the grid
+                self.t_due = utime.ticks_add(now, self.period_us)
+        else:
+            if self.misses < MAX_MISSES:
+                for i in range(BURST_SIZE):
+                    if raw[i] != last[i]:
+                        break
+                else:
+                    self.misses += 1
+                    self.t_due = utime.ticks_add(now, RETRY_US)
+                    return False
+            self.t_due = utime.ticks_add(now, self.period_us - EARLY_US)
+        self.misses = 0
+        for i in range(BURST_SIZE):
+            last[i] = raw[i]
+            out[i] = raw[i]*scale
+        return True
+    
+    def readAll(self):
+        ''' @brief Returns angular velocities and Euler angles read in one I2C transaction
+            @return Tuple of gyro x, y, z in deg/s then Euler heading, roll, pitch in deg
+        '''
+        self.i2c.mem_read(self.raw, self.addr, BURST_REG)
+        return tuple(val/16 for val in struct.unpack_from('<hhhhhh', self.raw))
+        
     def deint(self):
         ''' @brief Turns off communication for IMU
         '''
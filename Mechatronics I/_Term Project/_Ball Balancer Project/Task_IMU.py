@@ -10,20 +10,39 @@
 import IMU
 import os
 import utime
+import array
+import attitude
 from pyb import I2C
+from shares import IMU_THX, IMU_THXD, IMU_THY, IMU_THYD
 
 ## @brief Converts degrees to radians
 deg2rad = 3.14159/180
+## @brief Converts raw gyro counts to rad/s
+GYR_SCALE = deg2rad/16
 
 class Task_IMU:
     '''@brief IMU task class running logic
         @details Collects IMU data and checks for calibration coefficients
     '''
     
-    def __init__(self,Shares):
+    def __init__(self,period,Shares,offset=0,cached=False,raw=False):
         ''' @brief Initial conditions done by IMU task
             @details Sets up serial communication to I2C, creates IMU driver object, and checks for file coefficients
+            @param period Period in ms at which the IMU is read, matched to the controller period
+            @param Shares shares.ArrayShare that platform angles and angular velocities are written to in place
+            @param offset Phase offset in ms of the I2C read within the period, used to keep it off the panel scan
+            @param cached True to read the device only once per output period, other updates leave the share as it
+                          is so the controller keeps the cached angles
+            @param raw True to run the BNO055 in its non-fusion accelerometer and gyro mode and estimate the angles
+                       with a complementary filter every update, instead of reading the 100 Hz fused Euler angles
         '''
+        ## @brief Period in ms at which the IMU is read
+        self.period = period
+        ## @brief Phase offset in ms of the I2C read within the period
+        self.offset = offset
+        ## @brief Time adjusts once clock reaches the period value plus the current time
+        self.next_time = utime.ticks_add(utime.ticks_ms(), period + offset)
+        
         ## @brief Creates I2C object
         i2c = I2C(1,I2C.MASTER)
         i2c.init(I2C.MASTER, baudrate=400000)
@@ -36,8 +55,21 @@ class Task_IMU:
         
         ## @brief Instantiates share for communication between task
         self.Shares = Shares
+        ## @brief Gyro and Euler data in rad/s and rad, filled in place by the driver every update
+        self.data = array.array('f', [0]*IMU.BURST_SIZE)
+        ## @brief True when updates only read the IMU once the device has a new sample
+        self.cached = cached
         
         self.getFileCoef()
+        
+        ## @brief Complementary filter estimating the angles in raw mode, None when the fused angles are read
+        self.filter = None
+        ## @brief ticks_us time of the last raw mode update
+        self.t_last = 0
+        if raw:
+            self.IMU_driver.setRawMode()
+            self.filter = attitude.Complementary()
+            self.t_last = utime.ticks_us()
     
     def getFileCoef(self):
         '''@brief Checks for IMU file calibration coefficients or writes a file with the coefficients
@@ -81,15 +113,59 @@ class Task_IMU:
                 print("calibrated")
                 return self.IMU_driver.getCalibCoef()
             
+    def run(self):
+        ''' 
+        @brief Reads the IMU once the period has elapsed
+        '''
+        if (utime.ticks_diff(utime.ticks_ms(), self.next_time) >= 0):
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
+            
     def update(self):
         ''' 
         @brief Updates euler angles and angular velocities and writes them to the IMU share
         '''
-        ## @brief Tuple containing heading, pitch, and roll for IMU
-        (h, th_x, th_y) = self.IMU_driver.readEuler()
-        ## @brief Tuple containing heading, pitch, and roll change over time
-        (hdot, thd_x, thd_y)  = self.IMU_driver.readOmega()
+        if self.filter is not None:
+            self.updateRaw()
+            return
+        # One burst read of gyro and Euler registers, converted straight to rad/s and rad
+        data = self.data
+        if self.cached:
+            if not self.IMU_driver.readIfDue(data, deg2rad/16):
+                return
+        else:
+            self.IMU_driver.readInto(data, deg2rad/16)
         
-        self.Shares.write((th_x*deg2rad, thd_x*deg2rad, th_y*deg2rad, thd_y*deg2rad))
-            
-            
\ No newline at end of file
+        self.Shares.write(IMU_THX, data[IMU.EUL_R])
+        self.Shares.write(IMU_THXD, data[IMU.OMG_Y])
+        self.Shares.write(IMU_THY, data[IMU.EUL_P])
+        self.Shares.write(IMU_THYD, data[IMU.OMG_Z])
+        self.Shares.stamp()
+    
+    def updateRaw(self):
+        ''' 
+        @brief Updates the angles from one raw gyro and accelerometer sample and writes them to the IMU share
+        @details The axes match the Euler output of NDOF mode, theta x is the roll about the sensor y axis and
+                 theta y the pitch about the sensor x axis, each integrated from the gyro rate about the same axis.
+                 Both follow the right hand rule of the gyro, a positive rotation about y tips gravity towards -x.
+                 The rates written to the share are the ones update() writes from the fused data, gyro y for theta
+                 x dot and gyro z for theta y dot, so switching modes does not change what the controller sees as
+                 the y rate. Gyro x, the rate about the pitch axis, is only used inside the filter. As in NDOF mode,
+                 theta y and theta y dot therefore come from different axes, theta y dot is not the derivative of
+                 theta y, and controller gains must not be tuned as if it were.
+        '''
+        m = self.IMU_driver.readMotion()
+        now = utime.ticks_us()
+        dt = utime.ticks_diff(now, self.t_last)/1e6
+        self.t_last = now
+        thd_x = m[IMU.GYR_Y]*GYR_SCALE
+        thd_y = m[IMU.GYR_Z]*GYR_SCALE
+        tilt = self.filter.tilt
+        self.filter.update(thd_x, m[IMU.GYR_X]*GYR_SCALE, tilt(-m[IMU.ACC_X], m[IMU.ACC_Z]), tilt(m[IMU.ACC_Y], m[IMU.ACC_Z]), dt)
+        th = self.filter.th
+        
+        self.Shares.write(IMU_THX, th[0])
+        self.Shares.write(IMU_THXD, thd_x)
+        self.Shares.write(IMU_THY, th[1])
+        self.Shares.write(IMU_THYD, thd_y)
+        self.Shares.stamp()
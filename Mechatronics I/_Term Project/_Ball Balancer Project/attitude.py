@@ -0,0 +1,62 @@
+'''@file attitude.py
+    @brief Complementary filter estimating the platform angles from raw gyro and accelerometer data.
+    @details Used by Task_IMU when the BNO055 runs in a non-fusion mode. Each angle integrates the gyro rate about its
+             axis, which follows fast motion without noise but drifts, and is pulled towards the tilt measured from the
+             direction of gravity by the accelerometer, which does not drift but picks up vibration and the
+             acceleration of the platform. With time constant tau the update is
+             th = a (th + w dt) + (1 - a) th_acc with a = tau / (tau + dt), so the gyro dominates above 1 / (2 pi tau)
+             and the accelerometer below. Imports nothing from MicroPython so the same module runs on the host.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+import math
+
+## @brief Default time constant in s at which the estimate hands over from the gyro to the accelerometer
+TAU = 0.5
+
+
+class Complementary:
+    ''' @brief                  Complementary filter for the two platform angles
+        @details                Keeps the estimate in an array and takes the sensor values as plain numbers, so no
+                                objects are created per update apart from the float results.
+    '''
+
+    def __init__(self, tau=TAU):
+        ''' @brief Constructs the filter
+            @param tau Time constant in s, longer trusts the gyro for longer
+        '''
+        ## @brief Time constant in s
+        self.tau = tau
+        ## @brief Estimated angles about x and y in rad
+        self.th = array.array('f', [0, 0])
+        ## @brief False until the first update has set the angles from the accelerometer
+        self.started = False
+
+    @staticmethod
+    def tilt(a_t, a_z):
+        ''' @brief Tilt angle about one axis measured from the direction of gravity
+            @param a_t Acceleration along the axis at right angles to both the rotation axis and z
+            @param a_z Acceleration along z
+            @return Angle in rad
+        '''
+        return math.atan2(a_t, a_z)
+
+    def update(self, w_x, w_y, acc_x, acc_y, dt):
+        ''' @brief Updates both angles with one sample
+            @param w_x Angular velocity about x in rad/s
+            @param w_y Angular velocity about y in rad/s
+            @param acc_x Angle about x measured by the accelerometer in rad
+            @param acc_y Angle about y measured by the accelerometer in rad
+            @param dt Time since the last update in s
+        '''
+        th = self.th
+        if not self.started:
+            (th[0], th[1]) = (acc_x, acc_y)
+            self.started = True
+            return
+        a = self.tau/(self.tau + dt)
+        th[0] = a*(th[0] + w_x*dt) + (1 - a)*acc_x
+        th[1] = a*(th[1] + w_y*dt) + (1 - a)*acc_y
@@ -0,0 +1,152 @@
+'''@file bench_loop.py
+    @brief Benchmark of the loop overhead of the polling loop, the scheduler and the uasyncio runtime.
+    @details Runs a set of dummy tasks with the term project periods and a fixed amount of busy work per run under
+             each runtime for the same amount of time. For every runtime it prints how many runs each task got,
+             the mean and worst start lateness against the task's nominal schedule, and how many loop passes or
+             idle calls were needed. Lateness is what the runtime overhead costs the tasks; passes that run nothing
+             are the CPU time the polling loop throws away. Run on the Nucleo with no hardware attached.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+import utime
+import uasyncio
+import scheduler
+import main_async
+
+from main import T_motor, T_user, T_data, T_control, T_tp, T_IMU, O_tp, O_IMU, O_control
+
+## @brief Length of each benchmark run in ms
+DURATION = 5000
+
+
+class DummyTask:
+    ''' @brief                  Stand-in task that busy-waits a fixed time and records its start lateness
+        @details                Has the same run() gate as the real tasks so it can be polled like main.py used to,
+                                and an update() for the scheduler and uasyncio runtime.
+    '''
+
+    def __init__(self, name, period, work_us, offset=0):
+        ''' @brief Constructs a dummy task
+            @param name Name printed in the results
+            @param period Task period in ms
+            @param work_us Busy work done every run in us
+            @param offset Phase offset in ms, as in main.py
+        '''
+        ## @brief Name printed in the results
+        self.name = name
+        ## @brief Task period in ms
+        self.period = period
+        ## @brief Busy work done every run in us
+        self.work_us = work_us
+        ## @brief Phase offset in ms
+        self.offset = offset
+        self.reset()
+
+    def reset(self):
+        ''' @brief Clears the statistics before a benchmark run
+        '''
+        ## @brief Time adjusts once clock reaches the period value plus the current time
+        self.next_time = utime.ticks_add(utime.ticks_ms(), self.period + self.offset)
+        ## @brief Number of runs
+        self.runs = 0
+        ## @brief Start time of the first run in ticks_us
+        self.t_first = 0
+        ## @brief Sum of start lateness in us
+        self.late_sum = 0
+        ## @brief Worst start lateness in us
+        self.late_max = 0
+
+    def run(self):
+        ''' @brief Runs update() when the period has elapsed, like the term project tasks
+        '''
+        if (utime.ticks_diff(utime.ticks_ms(), self.next_time) >= 0):
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
+
+    def update(self):
+        ''' @brief Records the start lateness against the first run, then busy-waits
+        '''
+        t = utime.ticks_us()
+        if self.runs == 0:
+            self.t_first = t
+        else:
+            late = utime.ticks_diff(t, self.t_first) - self.runs*self.period*1000
+            if late < 0:
+                late = 0
+            self.late_sum += late
+            if late > self.late_max:
+                self.late_max = late
+        self.runs += 1
+        while utime.ticks_diff(utime.ticks_us(), t) < self.work_us:
+            pass
+
+
+def makeTasks():
+    '''@brief Creates dummy tasks with the term project periods and rough execution times
+        @return List of dummy tasks in main.py order
+    '''
+    return [DummyTask('TP', T_tp, 400, O_tp),
+            DummyTask('IMU', T_IMU, 600, O_IMU),
+            DummyTask('Control', T_control, 300, O_control),
+            DummyTask('Motor', T_motor, 100, O_control),
+            DummyTask('User', T_user, 1000),
+            DummyTask('Data', T_data, 2000)]
+
+
+def benchPoll(tasks):
+    '''@brief Original main.py loop calling every task's run() back to back
+        @return Number of loop passes
+    '''
+    passes = 0
+    t0 = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), t0) < DURATION:
+        for task in tasks:
+            task.run()
+        passes += 1
+    return passes
+
+
+def benchSched(tasks):
+    '''@brief Scheduler loop idling with wfi between deadlines
+        @return Number of scheduler passes
+    '''
+    sched = scheduler.Scheduler(scheduler.SKIP, scheduler.IDLE_WFI)
+    for task in tasks:
+        sched.add(task, task.offset)
+    passes = 0
+    sched.start()
+    t0 = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), t0) < DURATION:
+        sched.run_once()
+        passes += 1
+    return passes
+
+
+def benchAsync(tasks):
+    '''@brief uasyncio runtime using the same coroutines as main_async.py
+        @return Number of loop passes, not available under uasyncio so always 0
+    '''
+    async def limit():
+        uasyncio.create_task(main_async.periodic((tasks[0],), O_tp))
+        uasyncio.create_task(main_async.periodic((tasks[1],), O_IMU))
+        uasyncio.create_task(main_async.periodic((tasks[2], tasks[3]), O_control))
+        uasyncio.create_task(main_async.periodic((tasks[4],)))
+        uasyncio.create_task(main_async.periodic((tasks[5],)))
+        await uasyncio.sleep_ms(DURATION)
+    uasyncio.run(limit())
+    uasyncio.new_event_loop()
+    return 0
+
+
+if __name__ == '__main__':
+    for (name, bench) in (('poll', benchPoll), ('scheduler', benchSched), ('uasyncio', benchAsync)):
+        tasks = makeTasks()
+        passes = bench(tasks)
+        print("{:} runtime, {:} loop passes in {:}ms".format(name, passes, DURATION))
+        print("Task        Runs  Expected  MeanLate(us)  MaxLate(us)")
+        for task in tasks:
+            mean = task.late_sum//(task.runs - 1) if task.runs > 1 else 0
+            print("{:<10}{:>6}{:>10}{:>14}{:>13}".format(task.name, task.runs, DURATION//task.period,
+                                                           mean, task.late_max))
+        print()
@@ -0,0 +1,66 @@
+'''@file bench_tp.py
+    @brief Benchmark of the touch panel scan time and heap allocations.
+    @details Runs the original TouchPanel.getScan(), which creates new Pin and ADC objects on every call, and the
+             preconfigured TouchPanel.scan() a fixed number of times each. For every method it prints the mean and
+             worst scan time and the bytes allocated on the heap per scan, with the garbage collector disabled during
+             the run so the allocation count is exact. scan() skips the X and Y phases without contact, so the share
+             of scans that found contact is printed as well. The last runs repeat scan() with the X and Y
+             reads oversampled by ADC.read_timed. Run on the Nucleo once with the ball resting on the
+             panel and once with the panel empty.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+import array
+import gc
+import utime
+import tp
+
+## @brief Number of scans per method
+N = 1000
+
+
+def bench(name, scan):
+    '''@brief Times a scan function and counts its heap allocations
+        @param name Name printed in the results
+        @param scan Function doing one scan and returning True on contact
+    '''
+    t_sum = 0
+    t_max = 0
+    contact = 0
+    gc.collect()
+    gc.disable()
+    mem0 = gc.mem_alloc()
+    for n in range(N):
+        t = utime.ticks_us()
+        z = scan()
+        t = utime.ticks_diff(utime.ticks_us(), t)
+        t_sum += t
+        if t > t_max:
+            t_max = t
+        if z:
+            contact += 1
+    mem = gc.mem_alloc() - mem0
+    gc.enable()
+    print("{:<10}{:>12}{:>12}{:>16.1f}{:>10}%".format(name, t_sum//N, t_max, mem/N, 100*contact//N))
+
+
+if __name__ == '__main__':
+    panel = tp.TouchPanel()
+    raw = array.array('H', [0, 0, 0])
+    pos = array.array('f', [0, 0])
+
+    def fast():
+        z = panel.scan(raw)
+        if z:
+            panel.position(raw, pos)
+        return z
+
+    print("{:} scans per method, scan+pos adds the calibration float math to scan".format(N))
+    print("{:<10}{:>12}{:>12}{:>16}{:>11}".format('Method', 'Mean(us)', 'Max(us)', 'Alloc(B/scan)', 'Contact'))
+    bench('getScan', lambda: panel.getScan()[2])
+    bench('scan', lambda: panel.scan(raw))
+    bench('scan+pos', fast)
+    for samples in (4, 8, 16):
+        samples = panel.setOversample(samples)
+        bench('scan x{:}'.format(samples), lambda: panel.scan(raw))
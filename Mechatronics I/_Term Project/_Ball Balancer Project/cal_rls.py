@@ -0,0 +1,90 @@
+'''@file cal_rls.py
+    @brief Recursive least squares refinement of the touch panel calibration.
+    @details Task_TP.calibrate() solves the affine calibration once from 9 touches by inverting X^T X. This estimator
+             instead updates the same 6 coefficients one reference touch at a time: every sample costs a fixed
+             number of multiplications on a 3 by 3 covariance matrix, and nothing grows with the number of samples or
+             needs inverting. The model is the one TouchPanel.position() evaluates with the ADC counts xr and yr,
+             x = Kxx xr + Kxy yr + Xc and y = Kyx xr + Kyy yr + Yc, and the coefficients are kept in the order of
+             RT_cal_coeffs.txt (Kxx, Kxy, Kyx, Kyy, Xc, Yc). Both outputs share the regressor [xr yr 1], so they share
+             one covariance matrix.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+
+## @brief Default forgetting factor, slightly below 1 so the calibration can follow slow drift of the panel
+LAMBDA = 0.995
+## @brief Default initial variance of the count coefficients, (0.005 mm/count)^2
+P_GAIN = 2.5e-5
+## @brief Default initial variance of the offsets, (5 mm)^2
+P_OFFSET = 25.0
+## @brief Index in the coefficients of the x output coefficient of each regressor xr, yr and 1
+X_INDEX = (0, 1, 4)
+## @brief Index in the coefficients of the y output coefficient of each regressor xr, yr and 1
+Y_INDEX = (2, 3, 5)
+
+
+class CalRLS:
+    ''' @brief                  Streaming estimator of the affine touch panel calibration
+        @details                Starts from the existing coefficients, with an initial covariance that says how far
+                                they are trusted, and refines them with update() every time the ball or a finger is at
+                                a known position.
+    '''
+
+    def __init__(self, calV, lam=LAMBDA, p_gain=P_GAIN, p_offset=P_OFFSET):
+        ''' @brief Constructs the estimator
+            @param calV Starting calibration coefficients Kxx Kxy Kyx Kyy xc and yc
+            @param lam Forgetting factor, 1 to weigh every sample equally
+            @param p_gain Initial variance of the count coefficients
+            @param p_offset Initial variance of the offsets in mm^2
+        '''
+        ## @brief Coefficients Kxx Kxy Kyx Kyy Xc Yc, in the order of the calibration file
+        self.B = array.array('f', calV)
+        ## @brief Forgetting factor
+        self.lam = lam
+        ## @brief Covariance matrix P row by row
+        self.P = array.array('f', [p_gain, 0, 0,
+                                   0, p_gain, 0,
+                                   0, 0, p_offset])
+        ## @brief Scratch vector P phi
+        self.Pphi = array.array('f', [0, 0, 0])
+        ## @brief Number of samples taken
+        self.n = 0
+
+    def update(self, xr, yr, x_act, y_act):
+        ''' @brief Refines the coefficients with one reference sample
+            @param xr X ADC count of the touch
+            @param yr Y ADC count of the touch
+            @param x_act Known x position of the touch in mm
+            @param y_act Known y position of the touch in mm
+            @return Distance in mm between the known position and the estimate before the update
+        '''
+        P = self.P
+        B = self.B
+        Pphi = self.Pphi
+        # P phi and phi^T P phi with phi = [xr, yr, 1], P is symmetric
+        for i in range(3):
+            Pphi[i] = P[3*i]*xr + P[3*i + 1]*yr + P[3*i + 2]
+        denom = self.lam + xr*Pphi[0] + yr*Pphi[1] + Pphi[2]
+        # prediction errors of both outputs
+        ex = x_act - (xr*B[0] + yr*B[1] + B[4])
+        ey = y_act - (xr*B[2] + yr*B[3] + B[5])
+        # each output's coefficients += K e with the gain K = P phi / denom
+        for i in range(3):
+            k = Pphi[i]/denom
+            B[X_INDEX[i]] += k*ex
+            B[Y_INDEX[i]] += k*ey
+        # P = (P - P phi phi^T P / denom) / lam
+        for i in range(3):
+            for j in range(3):
+                P[3*i + j] = (P[3*i + j] - Pphi[i]*Pphi[j]/denom)/self.lam
+        self.n += 1
+        return (ex*ex + ey*ey)**0.5
+
+    def coefficients(self):
+        ''' @brief Current calibration coefficients
+            @return Tuple of Kxx Kxy Kyx Kyy xc and yc, as taken by TouchPanel.setCalV()
+        '''
+        return tuple(self.B)
@@ -0,0 +1,152 @@
+'''@file bench_filter.py
+    @brief Host benchmark of the touch panel alpha-beta filter against the steady state Kalman filter.
+    @details Simulates a ball rolling on the tilting platform, with an acceleration that follows a random walk of the
+             platform angle, and samples its position at the touch panel period with measurement noise. Some samples
+             arrive one period late, like a scheduler pass that ran over. Both the alpha-beta update of
+             Task_TP.contactPoint (alpha = 0.85, beta = 0.005) and the constant velocity Kalman filter of kalman.py
+             estimate position and velocity from the same samples. The RMS position and velocity errors and the time
+             per update are printed for both. Times are CPython times, only the ratio carries over to the Nucleo.
+             Runs with regular Python 3 on the host, for example:
+             python3 host/bench_filter.py --noise 0.7 --late 0.05
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import kalman
+
+## @brief Gravity in mm/s^2
+G = 9810
+## @brief Simulation time step in s
+DT = 1e-4
+
+
+def simulate(seconds, period, late, noise, seed):
+    '''@brief Simulates the ball and the touch panel samples
+        @param seconds Length of the run in s
+        @param period Touch panel sample period in s
+        @param late Probability that a sample comes one period late
+        @param noise Standard deviation of the measurement noise in mm
+        @param seed Random seed
+        @return List of (sample period, measured position, true position, true velocity) tuples
+    '''
+    rng = random.Random(seed)
+    (p, v, th) = (0.0, 0.0, 0.0)
+    samples = []
+    t = 0.0
+    t_next = period
+    t_last = 0.0
+    while t < seconds:
+        # platform angle random walk, limited to +-0.2 rad, ball kept on the 88 mm half width panel
+        th = max(-0.2, min(0.2, th + rng.gauss(0, 0.002)))
+        a = 5/7*G*math.sin(th)
+        if abs(p) > 80:
+            a = -math.copysign(5/7*G*0.2, p)
+        v += a*DT
+        p += v*DT
+        t += DT
+        if t >= t_next:
+            samples.append((t - t_last, p + rng.gauss(0, noise), p, v))
+            t_last = t
+            t_next += period*(2 if rng.random() < late else 1)
+    return samples
+
+
+def alphaBeta(samples):
+    '''@brief Runs the alpha-beta update of Task_TP.contactPoint
+        @param samples Samples from simulate()
+        @return List of (position, velocity) estimates
+    '''
+    alpha = 0.85
+    beta = 0.005
+    (xcur, Vxcur) = (samples[0][1], 0.0)
+    out = [(xcur, Vxcur)]
+    for (T_s, x, _, _) in samples[1:]:
+        xcur_temp = xcur
+        xcur = xcur_temp+alpha*(x-xcur_temp)+T_s*Vxcur
+        Vxcur = Vxcur+beta/T_s*(x-xcur_temp)
+        out.append((xcur, Vxcur))
+    return out
+
+
+def steadyKalman(samples, kf):
+    '''@brief Runs the steady state Kalman update of Task_TP.contactPoint
+        @param samples Samples from simulate()
+        @param kf kalman.CVKalman gain table
+        @return List of (position, velocity) estimates
+    '''
+    (xcur, Vxcur) = (samples[0][1], 0.0)
+    out = [(xcur, Vxcur)]
+    for (T_s, x, _, _) in samples[1:]:
+        n = kf.index(T_s)
+        k1 = kf.k1[n]
+        k2 = kf.k2[n]
+        xp = xcur + T_s*Vxcur
+        ex = x - xp
+        xcur = xp + k1*ex
+        Vxcur += k2*ex
+        out.append((xcur, Vxcur))
+    return out
+
+
+def rms(samples, est, skip):
+    '''@brief RMS position and velocity error of an estimate
+        @param samples Samples from simulate()
+        @param est Estimates in the same order
+        @param skip Number of samples ignored at the start while the filter settles
+        @return Tuple of position error in mm and velocity error in mm/s
+    '''
+    pairs = list(zip(samples, est))[skip:]
+    ep = math.sqrt(sum((e[0] - s[2])**2 for (s, e) in pairs)/len(pairs))
+    ev = math.sqrt(sum((e[1] - s[3])**2 for (s, e) in pairs)/len(pairs))
+    return (ep, ev)
+
+
+def timePerUpdate(run, samples, repeat):
+    '''@brief Best time per sample of a filter over several runs
+        @return Time per update in ns
+    '''
+    best = None
+    for n in range(repeat):
+        t = time.perf_counter_ns()
+        run(samples)
+        t = time.perf_counter_ns() - t
+        best = t if best is None or t < best else best
+    return best/len(samples)
+
+
+def main():
+    '''@brief Parses the command line, runs both filters and prints the comparison
+    '''
+    parser = argparse.ArgumentParser(description='Alpha-beta against steady state Kalman filter on a simulated ball')
+    parser.add_argument('--seconds', type=float, default=20, help='length of the simulated run in s')
+    parser.add_argument('--period', type=float, default=3, help='touch panel period in ms (T_tp in main.py)')
+    parser.add_argument('--late', type=float, default=0.02, help='probability of a sample one period late')
+    parser.add_argument('--noise', type=float, default=0.7, help='measurement noise standard deviation in mm')
+    parser.add_argument('--q', type=float, default=kalman.Q, help='Kalman acceleration noise density in mm^2/s^3')
+    parser.add_argument('--r', type=float, default=kalman.R, help='Kalman measurement variance in mm^2')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    samples = simulate(args.seconds, args.period/1000, args.late, args.noise, args.seed)
+    kf = kalman.CVKalman(args.q, args.r)
+    n = kf.index(args.period/1000)
+    print("{:} samples, Kalman gains at {:}ms: k1 = {:.4f}, k2 = {:.2f}/s\n".format(
+          len(samples), n, kf.k1[n], kf.k2[n]))
+    print("{:<14}{:>14}{:>18}{:>16}".format('Filter', 'Pos RMS(mm)', 'Vel RMS(mm/s)', 'Update(ns)'))
+    skip = len(samples)//20
+    for (name, run) in (('alpha-beta', alphaBeta), ('Kalman', lambda s: steadyKalman(s, kf))):
+        (ep, ev) = rms(samples, run(samples), skip)
+        print("{:<14}{:>14.3f}{:>18.1f}{:>16.0f}".format(name, ep, ev, timePerUpdate(run, samples, 5)))
+
+
+if __name__ == '__main__':
+    main()
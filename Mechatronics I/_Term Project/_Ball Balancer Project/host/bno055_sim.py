@@ -0,0 +1,358 @@
+'''@file bno055_sim.py
+    @brief Register level BNO055 emulator standing in for pyb.I2C, and a host benchmark of the IMU read paths.
+    @details BNO055Sim answers mem_read() and mem_write() like a BNO055 on the I2C bus: operating mode at 0x3D,
+             PAGE_ID at 0x07, CALIB_STAT at 0x35, the 22 byte calibration profile from 0x55, accelerometer data from
+             0x08, gyro data from 0x14, Euler angles from 0x1A and the page 1 sensor configuration. The data
+             registers follow an attitude trajectory, synthetic or replayed from a CSV file, on the simulated clock of
+             mpshim. In NDOF mode they update every 10 ms like the fused output, in the non-fusion modes every 1 ms,
+             and in CONFIG mode they hold still. CALIB_STAT climbs to fully calibrated over a few simulated seconds,
+             so Task_IMU.calibrate() runs too. Every transaction and byte is counted, and the bus time at the set
+             baudrate is added to the simulated clock, so driver changes can be measured. install() puts it in place
+             of pyb.I2C, after which IMU.py, Task_IMU.py (with its IMU_cal_coeffs.txt file) and Lab5/main.py run
+             unmodified. Runs with regular Python 3 on the host, for example:
+             python3 host/bno055_sim.py --seconds 5
+             python3 host/bno055_sim.py --trajectory tilt.csv --noise
+             python3 host/bno055_sim.py --lab5 3
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import argparse
+import math
+import os
+import random
+import runpy
+import shutil
+import struct
+import sys
+import tempfile
+
+import mpshim
+
+## @brief I2C address of the BNO055 with COM3 low
+ADDR = 0x28
+## @brief Operating mode values of the fusion modes, the others are CONFIG (0) and the non-fusion modes
+FUSION_MODES = (0x08, 0x09, 0x0A, 0x0B, 0x0C)
+## @brief Output period in us of the fused data
+FUSION_PERIOD_US = 10000
+## @brief Output period in us of the raw data in the non-fusion modes
+RAW_PERIOD_US = 1000
+## @brief Simulated time in s until CALIB_STAT reports every system fully calibrated
+CAL_S = 2.0
+## @brief Gravity in m/s^2
+G = 9.80665
+## @brief Lab5 folder, whose main.py --lab5 runs on the emulator
+LAB5 = os.path.join(mpshim.PROJECT, '..', '..', 'Lab5')
+
+
+def sine(roll=3.0, pitch=2.0, f_roll=0.5, f_pitch=0.7):
+    '''@brief Synthetic trajectory of the platform rocking about both axes
+        @param roll Roll amplitude in deg
+        @param pitch Pitch amplitude in deg
+        @param f_roll Roll frequency in Hz
+        @param f_pitch Pitch frequency in Hz
+        @return Function of the time in s returning heading, roll and pitch in deg
+    '''
+    return lambda t: (0.0, roll*math.sin(2*math.pi*f_roll*t), pitch*math.sin(2*math.pi*f_pitch*t))
+
+
+def replay(filename):
+    '''@brief Trajectory replayed from a CSV file, linearly interpolated and held after the last row
+        @param filename CSV file with rows of time in s, heading, roll and pitch in deg, a header line is skipped
+        @return Function of the time in s returning heading, roll and pitch in deg
+    '''
+    rows = []
+    with open(filename) as f:
+        for line in f:
+            try:
+                rows.append(tuple(float(value) for value in line.split(',')[0:4]))
+            except ValueError:
+                continue
+    if not rows:
+        raise ValueError(filename + ' holds no trajectory rows')
+
+    def at(t):
+        if t <= rows[0][0]:
+            return rows[0][1:]
+        for (r0, r1) in zip(rows, rows[1:]):
+            if t <= r1[0]:
+                w = (t - r0[0])/(r1[0] - r0[0])
+                return tuple(a + w*(b - a) for (a, b) in zip(r0[1:], r1[1:]))
+        return rows[-1][1:]
+    return at
+
+
+def _int16(value):
+    '''@brief Rounds a register value and clamps it to int16
+    '''
+    return max(-32768, min(32767, int(round(value))))
+
+
+class BNO055Sim:
+    ''' @brief                  Fake pyb.I2C with a BNO055 behind it
+        @details                Takes the pyb.I2C constructor arguments, so it can replace the class as is. The
+                                trajectory gives the attitude, the rates are its derivatives and the accelerometer sees
+                                gravity tilted by roll about y and pitch about x, the convention of Task_IMU.updateRaw().
+    '''
+    MASTER = 0
+    SLAVE = 1
+
+    def __init__(self, bus=1, mode=None, baudrate=400000, trajectory=None, noise=False, cal_s=CAL_S, stop_s=None,
+                 seed=1):
+        ''' @brief Creates the emulated bus and device
+            @param bus I2C bus number, ignored
+            @param mode pyb.I2C mode, ignored
+            @param baudrate Bus clock in Hz the bus time is counted at
+            @param trajectory Function of the time in s returning heading, roll and pitch in deg, sine() by default
+            @param noise True to add sensor noise to the raw gyro and accelerometer data
+            @param cal_s Simulated time in s until the device reports being fully calibrated
+            @param stop_s Simulated time in s after which the next transaction raises KeyboardInterrupt, ending
+                          programs that loop until Ctrl+C, None to run for ever
+            @param seed Random seed of the noise
+        '''
+        ## @brief Bus clock in Hz
+        self.baudrate = baudrate
+        ## @brief Attitude trajectory
+        self.trajectory = trajectory if trajectory is not None else sine()
+        ## @brief Standard deviations of the gyro noise in deg/s and accelerometer noise in m/s^2, zero without noise
+        self.noise = (0.1, 0.05) if noise else (0.0, 0.0)
+        ## @brief Simulated time in s until fully calibrated
+        self.cal_s = cal_s
+        ## @brief Simulated time in s after which transactions raise KeyboardInterrupt
+        self.stop_s = stop_s
+        ## @brief Random source of the noise
+        self.rng = random.Random(seed)
+        ## @brief Register pages 0 and 1
+        self.regs = (bytearray(0x80), bytearray(0x80))
+        self.regs[0][0x00] = 0xA0
+        ## @brief Simulated time in us of the start, the calibration time counts from it
+        self.t0 = mpshim._now_us
+        ## @brief Simulated time in us of the sample now in the data registers, None before the first
+        self.t_sample = None
+        self.reset()
+
+    def reset(self):
+        ''' @brief Clears the transaction and byte counts
+        '''
+        ## @brief Number of read transactions
+        self.reads = 0
+        ## @brief Number of write transactions
+        self.writes = 0
+        ## @brief Data bytes read
+        self.bytes_read = 0
+        ## @brief Data bytes written
+        self.bytes_written = 0
+        ## @brief Bus time of all transactions in us
+        self.bus_us = 0.0
+
+    def init(self, mode=None, baudrate=None, **kwargs):
+        ''' @brief Reinitialises the bus like pyb.I2C.init()
+        '''
+        if baudrate:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        ''' @brief Turns the bus off, nothing to do
+        '''
+        pass
+
+    def _transaction(self, addr, n, read):
+        ''' @brief Checks the address, counts a transaction and adds its bus time to the simulated clock
+            @param addr Device address
+            @param n Data bytes
+            @param read True for a read, which needs a repeated start and second address byte
+        '''
+        if self.stop_s is not None and mpshim._now_us - self.t0 >= 1e6*self.stop_s:
+            raise KeyboardInterrupt
+        if addr != ADDR:
+            raise OSError(5)
+        # 9 clocks per byte: address, register, (repeated start and address), data, plus start and stop
+        clocks = 9*((3 if read else 2) + n) + 2
+        t = 1e6*clocks/self.baudrate
+        self.bus_us += t
+        mpshim.advance(int(t))
+        if read:
+            self.reads += 1
+            self.bytes_read += n
+        else:
+            self.writes += 1
+            self.bytes_written += n
+
+    def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        ''' @brief Reads registers from memaddr on like pyb.I2C.mem_read()
+            @param data Buffer filled with the register values, or the number of bytes to read
+            @param addr Device address
+            @param memaddr First register
+            @return The buffer, or new bytes when data is a number
+        '''
+        n = data if isinstance(data, int) else len(memoryview(data).cast('B'))
+        self._transaction(addr, n, True)
+        self._update()
+        page = self.regs[self.regs[0][0x07] & 1]
+        values = bytes(page[(memaddr + i) & 0x7F] for i in range(n))
+        if isinstance(data, int):
+            return values
+        memoryview(data).cast('B')[:] = values
+        return data
+
+    def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        ''' @brief Writes registers from memaddr on like pyb.I2C.mem_write()
+            @param data Value of one register, or a buffer of values
+            @param addr Device address
+            @param memaddr First register
+        '''
+        values = bytes([data & 0xFF]) if isinstance(data, int) else bytes(memoryview(data).cast('B'))
+        self._transaction(addr, len(values), False)
+        page_id = self.regs[0][0x07] & 1
+        for (i, value) in enumerate(values):
+            reg = (memaddr + i) & 0x7F
+            if reg == 0x07:
+                # PAGE_ID is on both pages
+                self.regs[0][0x07] = self.regs[1][0x07] = value
+                page_id = value & 1
+            else:
+                self.regs[page_id][reg] = value
+        if page_id == 0 and memaddr == 0x3D:
+            # a new mode starts producing data at once
+            self.t_sample = None
+
+    def _update(self):
+        ''' @brief Loads the sample due at the current simulated time into the data registers
+        '''
+        regs = self.regs[0]
+        t_us = mpshim._now_us
+        level = min(3, int(3*(t_us - self.t0)/(1e6*self.cal_s))) if self.cal_s > 0 else 3
+        regs[0x35] = level | level << 2 | level << 4 | level << 6
+        mode = regs[0x3D] & 0x0F
+        if mode == 0:
+            return
+        period = FUSION_PERIOD_US if mode in FUSION_MODES else RAW_PERIOD_US
+        t_sample = t_us - t_us % period
+        if t_sample == self.t_sample:
+            return
+        self.t_sample = t_sample
+        t = (t_sample - self.t0)/1e6
+        (h, roll, pitch) = self.trajectory(t)
+        (h1, roll1, pitch1) = self.trajectory(t + 1e-4)
+        # gyro x about the pitch axis, y about the roll axis, z about the heading axis, in deg/s
+        gyro = [(pitch1 - pitch)*1e4, (roll1 - roll)*1e4, (h1 - h)*1e4]
+        (th, ph) = (math.radians(roll), math.radians(pitch))
+        acc = [-G*math.sin(th), G*math.cos(th)*math.sin(ph), G*math.cos(th)*math.cos(ph)]
+        (n_gyro, n_acc) = self.noise
+        if n_gyro:
+            gyro = [w + self.rng.gauss(0, n_gyro) for w in gyro]
+            acc = [a + self.rng.gauss(0, n_acc) for a in acc]
+        struct.pack_into('<hhh', regs, 0x08, *[_int16(100*a) for a in acc])
+        struct.pack_into('<hhh', regs, 0x14, *[_int16(16*w) for w in gyro])
+        if mode in FUSION_MODES:
+            struct.pack_into('<hhh', regs, 0x1A, _int16(16*(h % 360)), _int16(16*roll), _int16(16*pitch))
+
+    def report(self, seconds):
+        ''' @brief Transaction and byte counts per simulated second
+            @param seconds Simulated time the counts were taken over
+            @return Tuple of transactions, bytes and bus time in us per second
+        '''
+        return ((self.reads + self.writes)/seconds, (self.bytes_read + self.bytes_written)/seconds,
+                self.bus_us/seconds)
+
+
+def install(**kwargs):
+    '''@brief Installs mpshim and makes pyb.I2C create BNO055Sim objects
+        @details Must run before IMU.py or Task_IMU.py are imported, as they take I2C from pyb at import.
+        @param kwargs BNO055Sim arguments every bus is created with
+        @return List that every created bus is appended to, the last one is the one in use
+    '''
+    mpshim.install()
+    buses = []
+
+    class I2C(BNO055Sim):
+        def __init__(self, bus=1, mode=None, **more):
+            BNO055Sim.__init__(self, bus, mode, **dict(kwargs, **more))
+            buses.append(self)
+
+    sys.modules['pyb'].I2C = I2C
+    return buses
+
+
+def bench(name, task, bus, trajectory, seconds):
+    '''@brief Runs an IMU task on the simulated clock and prints the bus load and the angle error
+        @param name Name printed in the results
+        @param task Task_IMU object
+        @param bus BNO055Sim the task talks to
+        @param trajectory Trajectory the emulator follows
+        @param seconds Simulated time in s
+    '''
+    import shares
+    bus.reset()
+    (err_x, err_y, n) = (0.0, 0.0, 0)
+    t_end = mpshim._now_us + int(1e6*seconds)
+    while mpshim._now_us < t_end:
+        mpshim.advance(1000)
+        task.run()
+        (h, roll, pitch) = trajectory((mpshim._now_us - bus.t0)/1e6)
+        err_x += (task.Shares.read(shares.IMU_THX) - math.radians(roll))**2
+        err_y += (task.Shares.read(shares.IMU_THY) - math.radians(pitch))**2
+        n += 1
+    (trans, nbytes, bus_us) = bus.report(seconds)
+    print("{:<14}{:>12.0f}{:>12.0f}{:>14.1f}{:>14.3f}{:>14.3f}".format(
+          name, trans, nbytes, bus_us/1000, math.degrees(math.sqrt(err_x/n)), math.degrees(math.sqrt(err_y/n))))
+
+
+def main():
+    '''@brief Parses the command line and runs the benchmark or Lab5/main.py on the emulator
+    '''
+    parser = argparse.ArgumentParser(description='BNO055 emulator benchmark of the IMU read paths')
+    parser.add_argument('--seconds', type=float, default=5, help='simulated time per read path in s')
+    parser.add_argument('--trajectory', help='CSV of time in s, heading, roll, pitch in deg to replay')
+    parser.add_argument('--noise', action='store_true', help='add sensor noise to the raw data')
+    parser.add_argument('--period', type=int, default=3, help='IMU task period in ms (T_IMU in main.py)')
+    parser.add_argument('--lab5', type=float, metavar='SECONDS', help='run Lab5/main.py for this simulated time instead')
+    args = parser.parse_args()
+
+    trajectory = replay(args.trajectory) if args.trajectory else sine()
+    if args.lab5 is not None:
+        install(trajectory=trajectory, noise=args.noise, stop_s=args.lab5)
+        # Lab5 has its own IMU.py, which must be found before the term project's
+        sys.path.insert(0, os.path.abspath(LAB5))
+        runpy.run_path(os.path.join(LAB5, 'main.py'), run_name='__main__')
+        return
+
+    buses = install(trajectory=trajectory, noise=args.noise)
+    import Task_IMU
+    import shares
+
+    cwd = os.getcwd()
+    work = tempfile.mkdtemp()
+    os.chdir(work)
+    try:
+        # a first task calibrates on the emulator and writes IMU_cal_coeffs.txt, the benchmarked tasks are only
+        # created after it so their next_time is not left behind by the calibration
+        Task_IMU.Task_IMU(args.period, shares.ArrayShare(shares.IMU_SIZE))
+        print("Calibrated after {:.2f}s simulated, IMU_cal_coeffs.txt written".format(mpshim._now_us/1e6))
+        legacy = Task_IMU.Task_IMU(args.period, shares.ArrayShare(shares.IMU_SIZE))
+
+        def twoReads():
+            (h, th_x, th_y) = legacy.IMU_driver.readEuler()
+            (hdot, thd_x, thd_y) = legacy.IMU_driver.readOmega()
+            legacy.Shares.write(shares.IMU_THX, th_x*Task_IMU.deg2rad)
+            legacy.Shares.write(shares.IMU_THXD, thd_x*Task_IMU.deg2rad)
+            legacy.Shares.write(shares.IMU_THY, th_y*Task_IMU.deg2rad)
+            legacy.Shares.write(shares.IMU_THYD, thd_y*Task_IMU.deg2rad)
+            legacy.Shares.stamp()
+        legacy.update = twoReads
+
+        print("\n{:.0f}s simulated per read path, IMU task every {:}ms".format(args.seconds, args.period))
+        print("{:<14}{:>12}{:>12}{:>14}{:>14}{:>14}".format(
+              'Read path', 'Trans/s', 'Bytes/s', 'Bus(ms/s)', 'ThX RMS(deg)', 'ThY RMS(deg)'))
+        bench('two reads', legacy, buses[-1], trajectory, args.seconds)
+        for (name, cached, raw) in (('burst', False, False), ('cached', True, False), ('raw+filter', False, True)):
+            task = Task_IMU.Task_IMU(args.period, shares.ArrayShare(shares.IMU_SIZE), 0, cached, raw)
+            bench(name, task, buses[-1], trajectory, args.seconds)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
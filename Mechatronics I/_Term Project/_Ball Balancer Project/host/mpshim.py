@@ -0,0 +1,150 @@
+'''@file mpshim.py
+    @brief Minimal stand-ins for the MicroPython modules so term project code can run under CPython on the host.
+    @details install() registers utime, pyb, micropython and ulab modules in sys.modules and puts the project folder on
+             the import path, after which task and driver modules import unchanged. utime runs on a simulated clock in
+             us that the host tool advances with setTime() or advance(), with the same 2^30 wraparound as the
+             Nucleo, so recorded ticks_us values can be fed straight back. The pyb pins, ADCs and timers accept every
+             call and do nothing, ADC reads return 0, so a host tool replaces the driver methods it feeds with
+             recorded data. Only used by the host tools in this folder, never copied to the Nucleo.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import os
+import sys
+import types
+
+## @brief Project folder holding the MicroPython sources
+PROJECT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+## @brief ticks_ms and ticks_us wrap at this period, as on the Nucleo
+TICKS_PERIOD = 1 << 30
+
+## @brief Simulated time in us
+_now_us = 0
+
+
+def setTime(t_us):
+    '''@brief Sets the simulated clock
+        @param t_us New time in us, a recorded ticks_us value works as is
+    '''
+    global _now_us
+    _now_us = t_us
+
+
+def advance(dt_us):
+    '''@brief Moves the simulated clock forward
+        @param dt_us Time step in us
+    '''
+    global _now_us
+    _now_us += dt_us
+
+
+def _ticks_diff(a, b):
+    '''@brief Signed difference of two tick values, as utime.ticks_diff
+    '''
+    d = (a - b) % TICKS_PERIOD
+    return d - TICKS_PERIOD if d >= TICKS_PERIOD//2 else d
+
+
+def _makeUtime():
+    '''@brief Builds the utime stand-in running on the simulated clock
+    '''
+    m = types.ModuleType('utime')
+    m.ticks_us = lambda: _now_us % TICKS_PERIOD
+    m.ticks_ms = lambda: (_now_us//1000) % TICKS_PERIOD
+    m.ticks_add = lambda a, b: (a + b) % TICKS_PERIOD
+    m.ticks_diff = _ticks_diff
+    m.sleep_us = lambda t: advance(t)
+    m.sleep_ms = lambda t: advance(1000*t)
+    m.sleep = lambda t: advance(int(1000000*t))
+    return m
+
+
+class _Anything:
+    '''@brief Accepts any constructor arguments and method call and does nothing
+    '''
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, attr):
+        return lambda *args, **kwargs: None
+
+
+class _Pin(_Anything):
+    '''@brief pyb.Pin stand-in with the mode constants and cpu pin names used by the drivers
+    '''
+    OUT_PP = 1
+    IN = 0
+    ANALOG = 3
+    PULL_NONE = 0
+
+    class cpu:
+        pass
+
+
+class _ADC(_Anything):
+    '''@brief pyb.ADC stand-in reading 0
+    '''
+    def read(self):
+        return 0
+
+    def read_timed(self, buf, timer):
+        for n in range(len(buf)):
+            buf[n] = 0
+
+
+def _makePyb():
+    '''@brief Builds the pyb stand-in
+    '''
+    m = types.ModuleType('pyb')
+    for name in ('A0', 'A1', 'A6', 'A7', 'B0', 'B1', 'B4', 'B5', 'B8', 'B9'):
+        setattr(_Pin.cpu, name, name)
+    m.Pin = _Pin
+    m.ADC = _ADC
+    m.Timer = _Anything
+    m.I2C = _Anything
+    m.USB_VCP = _Anything
+    m.disable_irq = lambda: 0
+    m.enable_irq = lambda state=0: None
+    m.wfi = lambda: None
+    m.delay = lambda ms: advance(1000*ms)
+    m.udelay = lambda us: advance(us)
+    return m
+
+
+def _makeMicropython():
+    '''@brief Builds the micropython stand-in, code emitters are ignored and scheduled callbacks run at once
+    '''
+    m = types.ModuleType('micropython')
+    m.native = lambda f: f
+    m.viper = lambda f: f
+    m.const = lambda x: x
+    m.schedule = lambda f, arg: f(arg)
+    m.alloc_emergency_exception_buf = lambda n: None
+    return m
+
+
+def _makeUlab():
+    '''@brief Builds the ulab stand-in, backed by numpy when it is installed
+    '''
+    m = types.ModuleType('ulab')
+    try:
+        import numpy
+        m.numpy = numpy
+    except ImportError:
+        m.numpy = types.ModuleType('numpy')
+    return m
+
+
+def install():
+    '''@brief Registers the stand-in modules and puts the project folder on the import path
+        @details Modules that are already imported are left as they are.
+    '''
+    for (name, make) in (('utime', _makeUtime), ('pyb', _makePyb), ('micropython', _makeMicropython),
+                         ('ulab', _makeUlab)):
+        if name not in sys.modules:
+            sys.modules[name] = make()
+    if PROJECT not in sys.path:
+        sys.path.insert(0, PROJECT)
@@ -0,0 +1,124 @@
+'''@file replay_tp.py
+    @brief Host replay of raw touch panel captures through the touch panel calibration and filter.
+    @details Reads a tp_capture.bin recorded on the Nucleo with the r command of Task_User and feeds every sample
+             through an unchanged Task_TP: TouchPanel.position() applies the calibration (and correction grid when
+             given), Task_TP.contactPoint() the alpha-beta or Kalman filter, and update() writes the ball share. Each
+             sample is replayed at its recorded ticks_us time on the simulated clock of mpshim, so the filter sees
+             the real sample periods, but the replay itself runs as fast as the host can. Prints the time per update
+             and optionally writes the estimates to a CSV file for plotting. Runs with regular Python 3 on the host,
+             for example:
+             python3 host/replay_tp.py tp_capture.bin --kalman --out replay.csv
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import argparse
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import mpshim
+
+
+def readCapture(filename, header, fmt):
+    '''@brief Reads a capture file
+        @param filename Path of the capture file
+        @param header struct format of the file header
+        @param fmt struct format of one sample
+        @return Tuple of the calibration coefficients and a list of (xr, yr, zr, t_us) samples
+    '''
+    with open(filename, 'rb') as f:
+        data = f.read()
+    (magic, Kxx, Kxy, Kyx, Kyy, xc, yc, n) = struct.unpack_from(header, data, 0)
+    if magic != b'TPC1':
+        raise ValueError(filename + ' is not a touch panel capture')
+    offset = struct.calcsize(header)
+    size = struct.calcsize(fmt)
+    samples = [struct.unpack_from(fmt, data, offset + i*size) for i in range(n)]
+    return ((Kxx, Kxy, Kyx, Kyy, xc, yc), samples)
+
+
+def main():
+    '''@brief Parses the command line, replays the capture and prints the results
+    '''
+    parser = argparse.ArgumentParser(description='Replay a raw touch panel capture through Task_TP')
+    parser.add_argument('capture', help='capture file written by Task_TP.saveCapture (tp_capture.bin)')
+    parser.add_argument('--kalman', action='store_true', help='use the steady state Kalman filter')
+    parser.add_argument('--cal', help='RT_cal_coeffs.txt to use instead of the coefficients stored in the capture')
+    parser.add_argument('--grid', help='correction grid file (RT_cal_grid.txt) to apply')
+    parser.add_argument('--repeat', type=int, default=5, help='replays timed, the best one is reported')
+    parser.add_argument('--out', help='CSV file the estimates are written to')
+    args = parser.parse_args()
+
+    mpshim.install()
+    import tp
+    import task_TP
+    import kalman
+    import shares
+
+    (calV, samples) = readCapture(args.capture, task_TP.CAPTURE_HEADER, task_TP.CAPTURE_FMT)
+    if not samples:
+        parser.error('the capture holds no samples')
+
+    # Task_TP reads its calibration files from the working directory, as on the Nucleo's flash
+    capture = os.path.abspath(args.capture)
+    cal = os.path.abspath(args.cal) if args.cal else None
+    grid = os.path.abspath(args.grid) if args.grid else None
+    cwd = os.getcwd()
+    work = tempfile.mkdtemp()
+    os.chdir(work)
+    try:
+        if cal:
+            shutil.copy(cal, 'RT_cal_coeffs.txt')
+        else:
+            with open('RT_cal_coeffs.txt', 'w') as f:
+                f.write(", ".join(map(str, calV)) + "\r\n1\r\n")
+        if grid:
+            shutil.copy(grid, task_TP.GRID_FILE)
+
+        best = None
+        for n in range(args.repeat):
+            ball = shares.ArrayShare(shares.BALL_SIZE)
+            mpshim.setTime(samples[0][3] - 3000)
+            task = task_TP.Task_TP(3, ball, estimator=kalman.CVKalman() if args.kalman else None)
+            raw = task.raw
+            current = [None]
+
+            def replayScan(buf):
+                (buf[0], buf[1], buf[2]) = current[0][0:3]
+                return buf[2] > tp.Z_THRESHOLD
+
+            task.tp.scan = replayScan
+            rows = []
+            t = time.perf_counter()
+            for sample in samples:
+                current[0] = sample
+                mpshim.setTime(sample[3])
+                task.update()
+                rows.append((sample[3], sample[0], sample[1], sample[2], ball.read(shares.BALL_X),
+                             ball.read(shares.BALL_Y), ball.read(shares.BALL_VX), ball.read(shares.BALL_VY)))
+            t = time.perf_counter() - t
+            best = t if best is None or t < best else best
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work)
+
+    contact = sum(1 for row in rows if row[3] > tp.Z_THRESHOLD)
+    span = mpshim._ticks_diff(samples[-1][3], samples[0][3])/1e6
+    print("{:} samples over {:.2f}s recorded, {:} with contact, {:} filter".format(
+          len(samples), span, contact, 'Kalman' if args.kalman else 'alpha-beta'))
+    print("Replay: {:.3f}s, {:.2f}us per update, {:.0f}x real time".format(
+          best, 1e6*best/len(samples), span/best if best > 0 else 0))
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write("t_us, xr, yr, zr, x, y, vx, vy\n")
+            for row in rows:
+                f.write(", ".join(map(str, row)) + "\n")
+        print("Estimates written to " + args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+'''@file sched_analysis.py
+    @brief Host side schedulability and WCET analysis of the term project task set.
+    @details Reads the task periods (T_motor, T_control, T_tp, ...) straight from main.py and the measured execution
+             times from the timing log the profiler writes on the Nucleo (timing.csv), or from --wcet values given on
+             the command line. It prints the CPU utilization and the worst case response time of every task for
+             three ways of running the set:
+             - the original polling loop, where every task can wait for one full pass of all the others,
+             - the cooperative scheduler in main.py, analysed as fixed priority non-preemptive scheduling in the
+               order tasks are added, with one scheduler tick of release jitter,
+             - preemptive rate-monotonic scheduling, as a reference for what an RTOS would give.
+             A task is schedulable when its response time is no longer than its period. Runs with regular
+             Python 3 on the host, for example:
+             python3 host/sched_analysis.py --log timing.csv --period Data=100
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import argparse
+import ast
+import csv
+import math
+import os
+
+## @brief Task names used by the profiler in main.py and the period constant each one runs at
+TASKS = (('TP', 'T_tp'),
+         ('IMU', 'T_IMU'),
+         ('Control', 'T_control'),
+         ('Motor', 'T_motor'),
+         ('User', 'T_user'),
+         ('Data', 'T_data'))
+
+## @brief Default location of main.py, next to the host folder
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main.py')
+
+
+def readPeriods(filename):
+    '''@brief Reads the integer period constants defined at the top level of main.py
+        @param filename Path of main.py
+        @return Dictionary of constant name to value in ms
+    '''
+    with open(filename, 'r') as f:
+        tree = ast.parse(f.read())
+    consts = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and isinstance(node.value.value, int):
+                    consts[target.id] = node.value.value
+    return consts
+
+
+def readLog(filename):
+    '''@brief Reads the worst case execution times from a profiler timing log
+        @param filename Path of the timing log
+        @return Dictionary of task name to measured maximum execution time in us
+    '''
+    wcet = {}
+    with open(filename, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            wcet[row['task']] = int(row['max_us'])
+    return wcet
+
+
+def utilization(tasks):
+    '''@brief Total CPU utilization of a task set
+        @param tasks List of (name, period us, wcet us) tuples
+        @return Utilization as a fraction of one CPU
+    '''
+    return sum(C/T for (_, T, C) in tasks)
+
+
+def respPolling(tasks):
+    '''@brief Response times in the original loop polling every task back to back
+        @details A task that just missed its check waits for one pass in which every other task may run once.
+        @param tasks List of (name, period us, wcet us) tuples
+        @return List of response times in us in the same order
+    '''
+    total = sum(C for (_, _, C) in tasks)
+    return [total for _ in tasks]
+
+
+def respPreemptive(tasks):
+    '''@brief Response times under preemptive fixed priority scheduling, highest priority first
+        @details Classic response time analysis, R = C + sum over higher priority tasks of ceil(R/Tj)*Cj.
+        @param tasks List of (name, period us, wcet us) tuples in priority order
+        @return List of response times in us, None when the iteration passes the period
+    '''
+    resp = []
+    for i, (_, Ti, Ci) in enumerate(tasks):
+        R = Ci
+        while True:
+            R_new = Ci + sum(math.ceil(R/Tj)*Cj for (_, Tj, Cj) in tasks[:i])
+            if R_new == R or R_new > Ti:
+                break
+            R = R_new
+        resp.append(R_new if R_new <= Ti else None)
+    return resp
+
+
+def respCooperative(tasks, jitter):
+    '''@brief Response times under fixed priority non-preemptive scheduling, highest priority first
+        @details A task can be blocked by the longest lower priority task that has just started, then waits for
+                 every higher priority release before it starts: w = B + sum over higher priority tasks of
+                 (floor((w + J)/Tj) + 1)*Cj, and R = J + w + C with J the release jitter of one scheduler tick.
+        @param tasks List of (name, period us, wcet us) tuples in priority order
+        @param jitter Release jitter in us
+        @return List of response times in us, None when the iteration passes the period
+    '''
+    resp = []
+    for i, (_, Ti, Ci) in enumerate(tasks):
+        B = max([C for (_, _, C) in tasks[i+1:]], default=0)
+        w = B
+        while True:
+            w_new = B + sum((math.floor((w + jitter)/Tj) + 1)*Cj for (_, Tj, Cj) in tasks[:i])
+            if w_new == w or jitter + w_new + Ci > Ti:
+                break
+            w = w_new
+        R = jitter + w_new + Ci
+        resp.append(R if R <= Ti else None)
+    return resp
+
+
+def report(title, tasks, resp):
+    '''@brief Prints the response time of every task and whether the set is schedulable
+        @param title Name of the scheduling policy
+        @param tasks List of (name, period us, wcet us) tuples
+        @param resp Response times in us in the same order, None when unbounded
+        @return True when every task meets its period
+    '''
+    print(title)
+    print("  Task        Period(us)  WCET(us)  Response(us)  OK")
+    ok = True
+    for (name, T, C), R in zip(tasks, resp):
+        met = R is not None and R <= T
+        ok = ok and met
+        print("  {:<10}{:>12}{:>10}{:>14}  {:}".format(name, T, C, R if R is not None else '> T',
+                                                      'yes' if met else 'NO'))
+    print("  Schedulable: {:}\n".format('yes' if ok else 'NO'))
+    return ok
+
+
+def main():
+    '''@brief Parses the command line, builds the task set and prints every analysis
+    '''
+    parser = argparse.ArgumentParser(description='Schedulability analysis of the ball balancer task set')
+    parser.add_argument('--main', default=MAIN, help='main.py to read the task periods from')
+    parser.add_argument('--log', help='timing log written by the profiler (timing.csv)')
+    parser.add_argument('--wcet', action='append', default=[], metavar='TASK=US',
+                        help='execution time of a task in us, overrides the log')
+    parser.add_argument('--period', action='append', default=[], metavar='TASK=MS',
+                        help='period of a task in ms, overrides main.py (e.g. Data=100 while recording)')
+    parser.add_argument('--jitter', type=int, default=1000,
+                        help='release jitter of the cooperative scheduler in us (one ticks_ms tick)')
+    args = parser.parse_args()
+
+    consts = readPeriods(args.main)
+    wcet = readLog(args.log) if args.log else {}
+    for item in args.wcet:
+        name, value = item.split('=')
+        wcet[name] = int(value)
+    periods = {name: consts[const] for (name, const) in TASKS if const in consts}
+    for item in args.period:
+        name, value = item.split('=')
+        periods[name] = int(value)
+
+    missing = [name for (name, _) in TASKS if name not in wcet]
+    if missing:
+        parser.error('no execution time for ' + ', '.join(missing) + ', give --log or --wcet')
+
+    ## Tasks in the order main.py adds them to the scheduler, which is their cooperative priority
+    tasks = [(name, periods[name]*1000, wcet[name]) for (name, _) in TASKS]
+    U = utilization(tasks)
+    n = len(tasks)
+    print("Utilization: {:.1f}% (rate-monotonic bound for {:} tasks: {:.1f}%)\n".format(
+          100*U, n, 100*n*(2**(1/n) - 1)))
+
+    report("Polling loop (original main.py)", tasks, respPolling(tasks))
+    report("Cooperative scheduler (non-preemptive, main.py order)", tasks, respCooperative(tasks, args.jitter))
+    rm = sorted(tasks, key=lambda task: task[1])
+    report("Rate-monotonic (preemptive)", rm, respPreemptive(rm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+'''@file test_cal_rls.py
+    @brief Host test of the recursive least squares calibration against the touch panel driver.
+    @details Generates touches from a known calibration with cross terms, refines a calibration that starts without
+             them through cal_rls.CalRLS, and checks the refined coefficients where they are used: set on a
+             tp.TouchPanel, position() must put every touch where it was made. Runs with pytest or on its own:
+             python3 host/test_cal_rls.py
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+import random
+
+import mpshim
+
+mpshim.install()
+import cal_rls
+import tp
+
+## @brief Calibration the touches are made with, Kxx Kxy Kyx Kyy xc yc, with cross terms of different size and sign
+TRUE_CAL = (0.05, 0.01, -0.008, 0.03, -102.0, -57.0)
+## @brief Starting calibration, the right scale and offsets but no cross terms
+START_CAL = (0.05, 0.0, 0.0, 0.03, -100.0, -55.0)
+
+
+def counts(x, y, cal):
+    '''@brief ADC counts giving a position under a calibration, the inverse of TouchPanel.position()
+    '''
+    (Kxx, Kxy, Kyx, Kyy, xc, yc) = cal
+    det = Kxx*Kyy - Kxy*Kyx
+    (dx, dy) = (x - xc, y - yc)
+    return ((Kyy*dx - Kxy*dy)/det, (Kxx*dy - Kyx*dx)/det)
+
+
+def test_refined_calibration_matches_position():
+    rng = random.Random(1)
+    rls = cal_rls.CalRLS(START_CAL, lam=1.0)
+    for n in range(200):
+        (x, y) = (rng.uniform(-88, 88), rng.uniform(-50, 50))
+        (xr, yr) = counts(x, y, TRUE_CAL)
+        rls.update(xr, yr, x, y)
+    for (got, want) in zip(rls.coefficients(), TRUE_CAL):
+        assert abs(got - want) < 1e-3*max(1, abs(want))
+
+    panel = tp.TouchPanel()
+    panel.setCalV(rls.coefficients())
+    pos = array.array('f', [0, 0])
+    for (x, y) in ((60, -54), (-88, 50), (0, 0), (88, -50), (-30, 20)):
+        (xr, yr) = counts(x, y, TRUE_CAL)
+        panel.position(array.array('f', [xr, yr, 0]), pos)
+        assert abs(pos[0] - x) < 0.05 and abs(pos[1] - y) < 0.05, (x, y, tuple(pos))
+
+
+if __name__ == '__main__':
+    test_refined_calibration_matches_position()
+    print('ok')
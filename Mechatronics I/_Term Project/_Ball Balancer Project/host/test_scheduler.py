@@ -0,0 +1,91 @@
+'''@file test_scheduler.py
+    @brief Host test of the lateness and deadline misses the scheduler reports to the profiler.
+    @details Runs scheduler.Scheduler with IDLE_WFI, as main.py does, on the simulated clock of mpshim, started
+             partway through a millisecond, with every clock read costing 1 us so start() can wait for the ms tick. A task that runs on time must be
+             reported about 0 us late, and a run that overruns its period must be counted as a miss. Runs with
+             pytest or on its own:
+             python3 host/test_scheduler.py
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import mpshim
+
+mpshim.install()
+import utime
+import profiler
+import scheduler
+
+
+class Recorder(profiler.Profiler):
+    '''@brief Profiler that also keeps the lateness of every run
+    '''
+    def __init__(self):
+        profiler.Profiler.__init__(self)
+        self.late = []
+
+    def record(self, n, t_start, t_exec, late, period):
+        self.late.append(late)
+        profiler.Profiler.record(self, n, t_start, t_exec, late, period)
+
+
+class Task:
+    '''@brief Task taking a set time per run, 500 us longer than its period on the runs listed in slow
+    '''
+    def __init__(self, period, t_exec, slow=()):
+        self.period = period
+        self.t_exec = t_exec
+        self.slow = slow
+        self.runs = 0
+
+    def update(self):
+        mpshim.advance(self.period*1000 + 500 if self.runs in self.slow else self.t_exec)
+        self.runs += 1
+
+
+def makeScheduler(prof):
+    '''@brief Scheduler on the simulated clock, each clock read advancing it by 1 us
+    '''
+    sched = scheduler.Scheduler(scheduler.SKIP, scheduler.IDLE_WFI, prof)
+
+    def ticks_ms():
+        mpshim.advance(1)
+        return utime.ticks_ms()
+
+    def ticks_us():
+        mpshim.advance(1)
+        return utime.ticks_us()
+    (sched.getTime, sched.getTime_us) = (ticks_ms, ticks_us)
+    return sched
+
+
+def test_on_time_runs_are_not_late():
+    mpshim.setTime(5000400)
+    prof = Recorder()
+    sched = makeScheduler(prof)
+    sched.add(Task(3, 200), 0, 'A')
+    sched.start()
+    for n in range(30):
+        sched.run_once()
+    assert len(prof.late) >= 20
+    assert max(abs(late) for late in prof.late) < 20, prof.late
+    assert prof.misses[0] == 0
+
+
+def test_overrun_is_a_miss():
+    mpshim.setTime(7000650)
+    prof = Recorder()
+    sched = makeScheduler(prof)
+    sched.add(Task(3, 200, slow=(5,)), 0, 'A')
+    sched.start()
+    for n in range(30):
+        sched.run_once()
+    # only the overrunning run misses, the next one starts 500 us late and still finishes in its period
+    assert prof.misses[0] == 1, list(prof.misses)
+
+
+if __name__ == '__main__':
+    test_on_time_runs_are_not_late()
+    test_overrun_is_a_miss()
+    print('ok')
@@ -0,0 +1,85 @@
+'''@file kalman.py
+    @brief Steady state constant velocity Kalman filter gains for the touch panel.
+    @details Models each axis of the ball as constant velocity driven by white noise acceleration, x = [p, v] with
+             F = [[1, T], [0, 1]], H = [1, 0], Q = q [[T^3/3, T^2/2], [T^2/2, T]] and measurement variance r. For a
+             fixed sample period the Kalman gain converges to a constant, so it is found once by iterating the
+             Riccati equation and the per sample update is only the predict and correct step with two stored gains,
+             as cheap as the alpha-beta filter. Task_TP measures the actual sample period every scan, so the gains are
+             tabulated for every whole ms up to TABLE_MS and looked up by the measured period. Imports nothing from
+             MicroPython so the same module runs in host/bench_filter.py.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+
+## @brief Default white noise acceleration spectral density in mm^2/s^3
+Q = 2.0e5
+## @brief Default touch panel measurement variance in mm^2
+R = 0.5
+## @brief Longest sample period in ms the gains are tabulated for
+TABLE_MS = 12
+
+
+def steadyGains(T, q=Q, r=R, tol=1e-9, iters=2000):
+    '''@brief Steady state Kalman gain of the constant velocity model
+        @param T Sample period in s
+        @param q White noise acceleration spectral density in mm^2/s^3
+        @param r Measurement variance in mm^2
+        @param tol Change of the gains below which the iteration has converged
+        @param iters Maximum number of iterations
+        @return Tuple of the position and velocity gains (k1, k2), k2 in 1/s
+    '''
+    (q11, q12, q22) = (q*T**3/3, q*T**2/2, q*T)
+    (p11, p12, p22) = (r, 0.0, r/(T*T))
+    (k1, k2) = (0.0, 0.0)
+    for n in range(iters):
+        # predict P = F P F^T + Q
+        m11 = p11 + 2*T*p12 + T*T*p22 + q11
+        m12 = p12 + T*p22 + q12
+        m22 = p22 + q22
+        # correct with the gain K = P H^T / (H P H^T + r)
+        s = m11 + r
+        (k1_new, k2_new) = (m11/s, m12/s)
+        p11 = (1 - k1_new)*m11
+        p12 = (1 - k1_new)*m12
+        p22 = m22 - k2_new*m12
+        if abs(k1_new - k1) < tol and abs(k2_new - k2) < tol:
+            return (k1_new, k2_new)
+        (k1, k2) = (k1_new, k2_new)
+    return (k1, k2)
+
+
+class CVKalman:
+    ''' @brief                  Table of steady state gains indexed by the sample period
+        @details                Task_TP finds the table entry of the measured period with index() and runs the
+                                predict and correct step itself with k1 and k2, so no objects are created per sample.
+    '''
+
+    def __init__(self, q=Q, r=R, table_ms=TABLE_MS):
+        ''' @brief Computes the gains for every whole ms sample period from 1 to table_ms
+            @param q White noise acceleration spectral density in mm^2/s^3
+            @param r Measurement variance in mm^2
+            @param table_ms Longest sample period in ms in the table
+        '''
+        ## @brief Position gain for each period in ms, index 0 unused
+        self.k1 = array.array('f', [0]*(table_ms + 1))
+        ## @brief Velocity gain in 1/s for each period in ms, index 0 unused
+        self.k2 = array.array('f', [0]*(table_ms + 1))
+        ## @brief Longest sample period in ms in the table
+        self.table_ms = table_ms
+        for ms in range(1, table_ms + 1):
+            (self.k1[ms], self.k2[ms]) = steadyGains(ms/1000, q, r)
+
+    def index(self, T_s):
+        ''' @brief Finds the table entry of a measured sample period
+            @param T_s Sample period in s
+            @return Index into k1 and k2, the period rounded to whole ms and clamped to the table
+        '''
+        ms = int(T_s*1000 + 0.5)
+        if ms < 1:
+            return 1
+        if ms > self.table_ms:
+            return self.table_ms
+        return ms
@@ -30,6 +30,12 @@ import Task_IMU
 import task_User
 import pyb
 import task_data
+import scheduler
+import profiler
+import rt_control
+import supervisor
+import share_monitor
+import kalman
 
 
 ##  @brief Moter task period (1 millisecond)
@@ -41,64 +47,151 @@ T_user = 100
 T_data = 5000
 ##  @brief User task period (1 millisecond)
 T_control = 3
+##  @brief Touch panel task period (3 milliseconds), matches the controller
+T_tp = 3
+##  @brief IMU task period (3 milliseconds), matches the controller
+T_IMU = 3
+
+##  @brief Scans the touch panel one non-blocking phase per T_tp_step instead of a whole scan per T_tp when True
+#   @details The panel then settles while the IMU and controller run instead of in sleep_us. A sample with contact
+#            takes three steps, one without contact a single step. Ignored in RT_MODE, where the chain runs the
+#            sense, control and actuate steps back to back and a whole scan is needed every tick.
+TP_SPLIT = False
+##  @brief Touch panel step period (1 millisecond) when TP_SPLIT is set
+T_tp_step = 1
+
+##  @brief Estimates the ball position and velocity with the steady state Kalman filter instead of alpha-beta when True
+TP_KALMAN = False
+
+##  @brief Reads the IMU only when its 100 Hz fused output can have changed when True
+#   @details The other IMU ticks make no I2C transaction and leave the share untouched, so the controller skips the
+#            state update it would have done with the same angles.
+IMU_CACHE = True
+##  @brief Runs the BNO055 in its non-fusion accelerometer and gyro mode with a complementary filter when True
+#   @details The platform angles then come from the 1 kHz gyro every T_IMU instead of the 100 Hz fused output,
+#            IMU_CACHE has no effect. The share keeps the fused mode's rate axes: theta y is filtered from gyro x
+#            about the pitch axis but theta y dot is gyro z, so as in NDOF mode theta y dot is not the derivative of
+#            theta y and the two must not be treated as a matched state pair when tuning gains.
+IMU_RAW = False
+
+##  @brief Touch panel phase offset (0 milliseconds), the ADC scan has its own tick
+O_tp = 0
+##  @brief IMU phase offset (1 millisecond), the I2C transfer never lands in the touch panel tick
+O_IMU = 1
+##  @brief Controller and motor phase offset (2 milliseconds), after both sensors have produced a sample
+O_control = 2
+
+##  @brief Runs the touch panel, IMU, control and motor chain from a hardware timer when True
+#   @details The user and data tasks then run alone in the background scheduler loop so they can no longer delay
+#            the balancing update.
+RT_MODE = False
+##  @brief Hardware timer driving the control chain in RT_MODE (timer 3 is used by the motor PWM)
+T_RT_TIMER = 6
+
+##  @brief Timing log written by the profiler when the program ends, read by host/sched_analysis.py
+TIMING_LOG = "timing.csv"
+
+##  @brief Wraps every share in a ShareMonitor counting accesses and data age, printed with the m command
+MONITOR_SHARES = False
 
 
 if __name__ == '__main__':
     
+    ##  @brief One contiguous array every numeric share is allocated from, snapshot() copies all of them at once
+    region = shares.Region()
     ##  @brief Share containing ball state variables x, y, vx, vy, z, and time change.
-    ball_share = shares.Share((0,0,0,0,0,0))
+    ball_share = region.share('ball')
     ##  @brief Share containing theta in x/y and angular velocity in x/y
-    IMU_share = shares.Share((0,0,0,0))
+    IMU_share = region.share('imu')
     ##  @brief Duties for both motors
-    duty_share = shares.Share((0,0))
+    duty_share = region.share('duty')
     ##  @brief Share containing all state variable data x,y, dx, dy, theta x/y, angular velocity x/y, and duties
-    State_share = shares.Share([0,0,0,0,0,0,0,0,0,0])
+    #   @details Seqlock protected because in RT_MODE the control chain can run between any two bytecodes of the
+    #            user and data tasks that read it.
+    State_share = region.share('state', shares.SeqShare)
     ##  @brief Determines whether motors are on or off.
-    Mode_share = shares.Share([0])
+    Mode_share = region.share('mode')
     ##  @brief Data collection parameters
     #   @details Contains frequency and total time of data collection, then determines what data should be collected
     collectStatus = shares.Share([0,0,[0,0,0,0,0,0,0,0,0,0]])
     
+    ##  @brief Share access monitors printed by the user task, empty unless MONITOR_SHARES is set
+    monitors = ()
+    if MONITOR_SHARES:
+        ball_share = share_monitor.ShareMonitor(ball_share, 'ball', shares.BALL_SIZE)
+        IMU_share = share_monitor.ShareMonitor(IMU_share, 'IMU', shares.IMU_SIZE)
+        duty_share = share_monitor.ShareMonitor(duty_share, 'duty', shares.DUTY_SIZE)
+        State_share = share_monitor.ShareMonitor(State_share, 'state', shares.STATE_SIZE)
+        Mode_share = share_monitor.ShareMonitor(Mode_share, 'mode', shares.MODE_SIZE)
+        collectStatus = share_monitor.ShareMonitor(collectStatus, 'collect')
+        monitors = (ball_share, IMU_share, duty_share, State_share, Mode_share, collectStatus)
     
     ##  @brief Creating a variable for the motor task in the Task_Motor Class at period T_motor
     motor_drv = motor.DRV8847(3)
     ##  @brief Motor task running at defined period and using motor driver object.
     motorTask = task_motor.Task_Motor(T_motor,duty_share,motor_drv)
     
+    ##  @brief True when the touch panel runs one scan phase per T_tp_step
+    tpSplit = TP_SPLIT and not RT_MODE
     ##  @brief Touch panel task sharing ball data
-    tpTask = task_TP.Task_TP(ball_share)   
+    tpTask = task_TP.Task_TP(T_tp_step if tpSplit else T_tp,ball_share,O_tp,tpSplit,
+                             kalman.CVKalman() if TP_KALMAN else None)
     ##  @brief Runs IMU task logic communicating IMU data in a share.
-    IMUTask = Task_IMU.Task_IMU(IMU_share)
+    IMUTask = Task_IMU.Task_IMU(T_IMU,IMU_share,O_IMU,IMU_CACHE,IMU_RAW)
+    
+    ##  @brief Execution time and jitter profiler for every task run by the scheduler
+    prof = profiler.Profiler()
+    ##  @brief Load shedding supervisor deferring display redraws and file appends when a pass nears T_control
+    superv = supervisor.Supervisor(T_control)
     
     ## @brief Communication reader between PuTTY and Nucleo board so user can type commands
     CommReader = pyb.USB_VCP()
     ##  @brief User task running at specified period and using USB VCP for reading communication.
     #   @details Uses system mode, state, and collect status shares
-    UserTask = task_User.Task_User(T_user, Mode_share, State_share, collectStatus, CommReader)
+    UserTask = task_User.Task_User(T_user, Mode_share, State_share, collectStatus, CommReader, prof, superv,
+                                   monitors, tpTask)
     
     
     ##  @brief Task that uses data collected by IMU and touch panel to send a duty for motors to run.
     cntrlTask = task_control.Task_Controller(T_control,ball_share, IMU_share, duty_share,State_share,Mode_share)
     
-    dataTask = task_data.Task_Data(T_data,collectStatus,State_share)
+    dataTask = task_data.Task_Data(T_data,collectStatus,State_share,superv,region)
     
+    ##  @brief Scheduler running each task at its period and idling until the next deadline
+    #   @details The touch panel, IMU and controller are staggered by their phase offsets so the ADC scan, the
+    #            I2C transfer and the control update each get their own 1 ms tick. Tasks due in the same tick run in
+    #            the order they are added: sense, control, actuate, then the user interface and data logging.
+    sched = scheduler.Scheduler(scheduler.SKIP, scheduler.IDLE_WFI, prof, superv)
+    if RT_MODE:
+        ##  @brief Control chain run from a hardware timer interrupt at the controller rate
+        rtChain = rt_control.RTControl(T_RT_TIMER, 1000//T_control, (tpTask, IMUTask, cntrlTask, motorTask))
+    else:
+        sched.add(tpTask, tpTask.offset, 'TP')
+        sched.add(IMUTask, IMUTask.offset, 'IMU')
+        sched.add(cntrlTask, O_control, 'Control')
+        sched.add(motorTask, O_control, 'Motor')
+    sched.add(UserTask, name='User')
+    sched.add(dataTask, name='Data')
+    sched.start()
+    if RT_MODE:
+        rtChain.start()
     
     while (True):
         try:
-            tpTask.update()
-            IMUTask.update()
-            cntrlTask.run()
-            motorTask.run()  
-            UserTask.run()
-            dataTask.run()
+            sched.run_once()
               
             
         except KeyboardInterrupt:      
             
             break
     
-    duty_share.write((0,0))
-    motorTask.run() 
+    if RT_MODE:
+        rtChain.stop()
+        rtChain.report()
+    duty_share.write(shares.DUTY_1, 0)
+    duty_share.write(shares.DUTY_2, 0)
+    motorTask.update() 
+    prof.save(TIMING_LOG)
     print('Program Terminating')
     
 
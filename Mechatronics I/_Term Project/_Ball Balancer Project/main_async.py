@@ -0,0 +1,124 @@
+'''@file main_async.py
+    @brief Alternative main file running the term project tasks as uasyncio coroutines.
+    @details Builds the same shares and tasks as main.py, but instead of a loop polling every task each task's
+             update() method is wrapped in a coroutine that awaits sleep_ms until its next deadline. The period
+             bookkeeping therefore lives in the runtime and not in the task classes. Key commands are read with a
+             non-blocking uasyncio StreamReader on the USB VCP and passed straight to Task_User.write(), replacing
+             the CommReader.any() polling. The existing classes and main.py are unchanged and still usable, and
+             bench_loop.py compares the loop overhead of both entry points. The user can exit program by pressing
+             cntrl+c
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+import motor
+import task_motor
+import shares
+import task_control
+import task_TP
+import Task_IMU
+import task_User
+import pyb
+import task_data
+import utime
+import uasyncio
+import kalman
+
+from main import (T_motor, T_user, T_data, T_control, T_tp, T_IMU, O_tp, O_IMU, O_control, TP_SPLIT, T_tp_step,
+                  TP_KALMAN, IMU_CACHE, IMU_RAW)
+
+
+async def periodic(tasks, offset=0):
+    '''@brief Runs the update() method of each task in order at the period of the first task
+        @details The deadline advances by one period per run so the execution time does not add drift. When the
+                 coroutine falls a whole period or more behind, the missed periods are skipped like the
+                 scheduler's SKIP policy. The period is read every run so tasks such as Task_Data can change it.
+        @param tasks Tuple of task objects with an update() method, the first one also supplies the period in ms
+        @param offset Phase offset in ms of the first run
+    '''
+    deadline = utime.ticks_add(utime.ticks_ms(), offset)
+    while (True):
+        wait = utime.ticks_diff(deadline, utime.ticks_ms())
+        await uasyncio.sleep_ms(wait if wait > 0 else 0)
+        for task in tasks:
+            task.update()
+        period = tasks[0].period
+        late = utime.ticks_diff(utime.ticks_ms(), deadline)
+        deadline = utime.ticks_add(deadline, period*(late//period + 1) if late >= period else period)
+
+
+async def user_input(UserTask, stream):
+    '''@brief Waits for key commands without polling and hands them to the user task
+        @param UserTask User task whose write() method handles the key command
+        @param stream USB VCP (or any stream) the key commands arrive on
+    '''
+    ## @brief Non-blocking reader that suspends this coroutine until a key arrives
+    sreader = uasyncio.StreamReader(stream)
+    while (True):
+        keyCommand = await sreader.read(1)
+        if keyCommand:
+            UserTask.write(keyCommand[0])
+
+
+async def run(tpTask, IMUTask, cntrlTask, motorTask, UserTask, dataTask, CommReader):
+    '''@brief Starts every coroutine and runs forever
+        @details The touch panel and IMU run in their own staggered coroutines, the controller and motor share one
+                 coroutine offset after both so control is always followed by actuation.
+    '''
+    uasyncio.create_task(periodic((tpTask,), tpTask.offset))
+    uasyncio.create_task(periodic((IMUTask,), IMUTask.offset))
+    uasyncio.create_task(periodic((cntrlTask, motorTask), O_control))
+    uasyncio.create_task(periodic((UserTask,)))
+    uasyncio.create_task(periodic((dataTask,)))
+    uasyncio.create_task(user_input(UserTask, CommReader))
+    while (True):
+        await uasyncio.sleep_ms(1000)
+
+
+if __name__ == '__main__':
+
+    ##  @brief One contiguous array every numeric share is allocated from, snapshot() copies all of them at once
+    region = shares.Region()
+    ##  @brief Share containing ball state variables x, y, vx, vy, z, and time change.
+    ball_share = region.share('ball')
+    ##  @brief Share containing theta in x/y and angular velocity in x/y
+    IMU_share = region.share('imu')
+    ##  @brief Duties for both motors
+    duty_share = region.share('duty')
+    ##  @brief Share containing all state variable data x,y, dx, dy, theta x/y, angular velocity x/y, and duties
+    State_share = region.share('state')
+    ##  @brief Determines whether motors are on or off.
+    Mode_share = region.share('mode')
+    ##  @brief Data collection parameters
+    collectStatus = shares.Share([0,0,[0,0,0,0,0,0,0,0,0,0]])
+
+    ##  @brief Motor driver using timer 3
+    motor_drv = motor.DRV8847(3)
+    ##  @brief Motor task setting the duties from the duty share
+    motorTask = task_motor.Task_Motor(T_motor,duty_share,motor_drv)
+    ##  @brief Touch panel task sharing ball data
+    tpTask = task_TP.Task_TP(T_tp_step if TP_SPLIT else T_tp,ball_share,O_tp,TP_SPLIT,
+                             kalman.CVKalman() if TP_KALMAN else None)
+    ##  @brief Runs IMU task logic communicating IMU data in a share.
+    IMUTask = Task_IMU.Task_IMU(T_IMU,IMU_share,O_IMU,IMU_CACHE,IMU_RAW)
+
+    ## @brief Communication stream between PuTTY and Nucleo board, read by the user_input coroutine
+    CommReader = pyb.USB_VCP()
+    ##  @brief User task, keys are passed to it by user_input so it gets no reader to poll
+    UserTask = task_User.Task_User(T_user, Mode_share, State_share, collectStatus, None, tpTask=tpTask)
+    ##  @brief Task that uses data collected by IMU and touch panel to send a duty for motors to run.
+    cntrlTask = task_control.Task_Controller(T_control,ball_share, IMU_share, duty_share,State_share,Mode_share)
+    ##  @brief Data recording task
+    dataTask = task_data.Task_Data(T_data,collectStatus,State_share,region=region)
+
+    try:
+        uasyncio.run(run(tpTask, IMUTask, cntrlTask, motorTask, UserTask, dataTask, CommReader))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        uasyncio.new_event_loop()
+
+    duty_share.write(shares.DUTY_1, 0)
+    duty_share.write(shares.DUTY_2, 0)
+    motorTask.update()
+    print('Program Terminating')
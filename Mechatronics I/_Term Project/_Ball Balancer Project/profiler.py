@@ -0,0 +1,138 @@
+'''@file profiler.py
+    @brief Per-task execution time and jitter profiler.
+    @details Keeps min, max and mean execution time, start-time jitter against the nominal period and deadline-miss
+             counts for every task run by the scheduler. All counters live in arrays that are allocated once when a
+             task is added so recording a sample inside the control loop does not touch the heap. Times are in
+             microseconds.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+import utime
+
+## @brief Sums are halved together with their counts before they leave the small int range
+SUM_LIMIT = 1 << 29
+
+
+class Profiler:
+    ''' @brief                  Execution time and jitter statistics for a set of tasks
+        @details                Rows are added once at start-up with add(), then record() is called after every run
+                                of a task. A deadline is missed when a run finishes after the end of its period.
+    '''
+
+    def __init__(self, size=8):
+        ''' @brief Constructs a profiler with room for a fixed number of tasks
+            @param size Maximum number of tasks that can be profiled
+        '''
+        ## @brief Task names used in the printed table
+        self.names = []
+        ## @brief Nominal period of the last recorded run in us
+        self.periods = array.array('l', [0]*size)
+        ## @brief Number of recorded runs (halved together with the sums)
+        self.count = array.array('l', [0]*size)
+        ## @brief Total number of recorded runs
+        self.runs = array.array('l', [0]*size)
+        ## @brief Minimum execution time in us
+        self.t_min = array.array('l', [0]*size)
+        ## @brief Maximum execution time in us
+        self.t_max = array.array('l', [0]*size)
+        ## @brief Sum of execution times in us
+        self.t_sum = array.array('l', [0]*size)
+        ## @brief Maximum absolute start-time jitter in us
+        self.jit_max = array.array('l', [0]*size)
+        ## @brief Sum of absolute start-time jitter in us
+        self.jit_sum = array.array('l', [0]*size)
+        ## @brief Start time of the previous run of each task in ticks_us
+        self.t_last = array.array('l', [0]*size)
+        ## @brief Number of missed deadlines
+        self.misses = array.array('l', [0]*size)
+        ## @brief Function to take time difference
+        self.tdif = utime.ticks_diff
+
+    def add(self, name):
+        ''' @brief Adds a row for a task
+            @param name Name printed in the table
+            @return Index of the row
+        '''
+        n = len(self.names)
+        self.names.append(name)
+        self.reset(n)
+        return n
+
+    def reset(self, n=None):
+        ''' @brief Clears the statistics of one task or of every task
+            @param n Index of the task to clear, all tasks when None
+        '''
+        if n is None:
+            for i in range(len(self.names)):
+                self.reset(i)
+            return
+        self.count[n] = 0
+        self.runs[n] = 0
+        self.t_min[n] = 0x3FFFFFFF
+        self.t_max[n] = 0
+        self.t_sum[n] = 0
+        self.jit_max[n] = 0
+        self.jit_sum[n] = 0
+        self.misses[n] = 0
+
+    def record(self, n, t_start, t_exec, late, period):
+        ''' @brief Records one run of a task
+            @param n Index of the task
+            @param t_start Start time of the run in ticks_us
+            @param t_exec Execution time of the run in us
+            @param late How late the run started against its deadline in us, measured from the ms tick the task was
+                        due at so a run that starts on time is about 0 late and the miss test below holds
+            @param period Nominal period of the task in us
+        '''
+        if t_exec < self.t_min[n]:
+            self.t_min[n] = t_exec
+        if t_exec > self.t_max[n]:
+            self.t_max[n] = t_exec
+        self.periods[n] = period
+        if self.runs[n] > 0:
+            jit = self.tdif(t_start, self.t_last[n]) - period
+            if jit < 0:
+                jit = -jit
+            if jit > self.jit_max[n]:
+                self.jit_max[n] = jit
+            self.jit_sum[n] += jit
+        if late + t_exec > period:
+            self.misses[n] += 1
+        self.t_last[n] = t_start
+        self.runs[n] += 1
+        self.count[n] += 1
+        self.t_sum[n] += t_exec
+        if self.t_sum[n] > SUM_LIMIT or self.jit_sum[n] > SUM_LIMIT:
+            self.count[n] >>= 1
+            self.t_sum[n] >>= 1
+            self.jit_sum[n] >>= 1
+
+    def report(self):
+        ''' @brief Prints the statistics of every task as a table
+        '''
+        print("Task        Period    Runs   Min(us)  Mean(us)   Max(us)  Jit(us) JitMax(us)  Miss")
+        for n in range(len(self.names)):
+            count = self.count[n]
+            if count == 0:
+                print("{:<10}{:>6}ms{:>8}".format(self.names[n], self.periods[n]//1000, 0))
+                continue
+            print("{:<10}{:>6}ms{:>8}{:>10}{:>10}{:>10}{:>9}{:>11}{:>6}".format(
+                  self.names[n], self.periods[n]//1000, self.runs[n], self.t_min[n], self.t_sum[n]//count,
+                  self.t_max[n], self.jit_sum[n]//count, self.jit_max[n], self.misses[n]))
+
+    def save(self, filename):
+        ''' @brief Writes the statistics of every task to a comma separated timing log
+            @details The log is read by host/sched_analysis.py to check the task set is schedulable.
+            @param filename Name of the file written on the flash drive
+        '''
+        with open(filename, 'w') as f:
+            f.write("task,period_ms,runs,min_us,mean_us,max_us,jitter_us,jitter_max_us,misses\r\n")
+            for n in range(len(self.names)):
+                count = self.count[n]
+                f.write("{:},{:},{:},{:},{:},{:},{:},{:},{:}\r\n".format(
+                        self.names[n], self.periods[n]//1000, self.runs[n], self.t_min[n] if count else 0,
+                        self.t_sum[n]//count if count else 0, self.t_max[n], self.jit_sum[n]//count if count else 0,
+                        self.jit_max[n], self.misses[n]))
@@ -0,0 +1,97 @@
+'''@file rt_control.py
+    @brief Runs the sense, control and actuate chain from a hardware timer.
+    @details A pyb.Timer interrupt fires at the control rate and uses micropython.schedule to run the update() method
+             of each task in the chain (touch panel, IMU, controller, motor) as soon as the current bytecode finishes.
+             The chain therefore no longer waits for the background loop to get round to it, so a long user task
+             print or a data task file write cannot delay the balancing update by more than one C-level call.
+             The interrupt itself only sets a flag, counts and schedules a preallocated callback, so it never
+             allocates. If the chain is still pending when the timer fires again the tick is counted as an overrun
+             instead of being queued twice.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import micropython
+import pyb
+import utime
+
+micropython.alloc_emergency_exception_buf(100)
+
+
+class RTControl:
+    ''' @brief                  Timer driven control chain
+        @details                Holds the tasks of the control chain and runs their update() methods in order every
+                                timer tick. Also keeps the worst case interrupt-to-chain latency and chain execution
+                                time in us so the bound can be checked on the rig.
+    '''
+
+    def __init__(self, timerNum, freq, tasks):
+        ''' @brief Constructs the control chain, the timer does not run until start() is called
+            @param timerNum Hardware timer used to trigger the chain, must not be shared with the motor PWM timer
+            @param freq Rate of the chain in Hz
+            @param tasks Tuple of task objects whose update() methods run in order every tick
+        '''
+        ## @brief Tasks of the chain in the order they run
+        self.tasks = tasks
+        ## @brief Hardware timer triggering the chain
+        self.timer = pyb.Timer(timerNum, freq=freq)
+        ## @brief True while a scheduled chain has not run yet
+        self.pending = False
+        ## @brief Number of completed chain runs
+        self.runs = 0
+        ## @brief Number of timer ticks dropped because the previous chain had not run yet
+        self.overruns = 0
+        ## @brief Time of the last timer interrupt in ticks_us
+        self.t_isr = 0
+        ## @brief Worst case time from timer interrupt to start of the chain in us
+        self.latency_max = 0
+        ## @brief Worst case execution time of the chain in us
+        self.t_max = 0
+        ## @brief Bound method references created once so the interrupt does not allocate them
+        self._isr_ref = self.isr
+        self._chain_ref = self.chain
+
+    def start(self):
+        ''' @brief Attaches the interrupt and starts running the chain
+        '''
+        self.pending = False
+        self.timer.callback(self._isr_ref)
+
+    def stop(self):
+        ''' @brief Detaches the interrupt so the chain stops running
+        '''
+        self.timer.callback(None)
+
+    def isr(self, tim):
+        ''' @brief Timer interrupt, schedules the chain without allocating
+            @param tim Timer that caused the interrupt
+        '''
+        if self.pending:
+            self.overruns += 1
+            return
+        self.pending = True
+        self.t_isr = utime.ticks_us()
+        micropython.schedule(self._chain_ref, 0)
+
+    def chain(self, arg):
+        ''' @brief Runs the update() method of every task in the chain
+            @param arg Unused argument passed by micropython.schedule
+        '''
+        t_start = utime.ticks_us()
+        latency = utime.ticks_diff(t_start, self.t_isr)
+        if latency > self.latency_max:
+            self.latency_max = latency
+        for task in self.tasks:
+            task.update()
+        t_exec = utime.ticks_diff(utime.ticks_us(), t_start)
+        if t_exec > self.t_max:
+            self.t_max = t_exec
+        self.runs += 1
+        self.pending = False
+
+    def report(self):
+        ''' @brief Prints run, overrun, latency and execution time statistics of the chain
+        '''
+        print("Control chain: {:} runs, {:} overruns, max latency {:}us, max execution {:}us".format(
+              self.runs, self.overruns, self.latency_max, self.t_max))
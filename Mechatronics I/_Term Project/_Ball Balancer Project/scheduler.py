@@ -0,0 +1,161 @@
+'''@file scheduler.py
+    @brief Cooperative scheduler that idles until the next task deadline.
+    @details Tasks are registered with the scheduler and run when their deadline arrives. After every pass the
+             scheduler finds the nearest upcoming deadline and idles (pyb.wfi or utime.sleep_ms) until it is due
+             instead of busy-polling every task. All time comparisons use utime.ticks_diff so the schedule survives
+             ticks_ms wrapping around. When a task overruns, the overrun policy decides whether the missed periods are
+             skipped or run back to back until the task has caught up.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import pyb
+import utime
+
+## @brief Overrun policy that drops missed periods and realigns the task to its next future deadline
+SKIP = 0
+## @brief Overrun policy that runs every missed period in a burst until the task has caught up
+CATCH_UP = 1
+
+## @brief Idle mode that busy-waits (no power saving, lowest wake-up latency)
+IDLE_NONE = 0
+## @brief Idle mode that waits for interrupt, waking at least every SysTick (1 ms)
+IDLE_WFI = 1
+## @brief Idle mode that calls utime.sleep_ms for the whole gap
+IDLE_SLEEP = 2
+
+
+class Scheduler:
+    ''' @brief                  Runs registered tasks at their periods and idles between deadlines
+        @details                A task is any object with a period attribute (ms) and an update() method doing one
+                                period of work. The period is read again every time a task is rescheduled so tasks
+                                such as Task_Data can change their own rate. Tasks that are due in the same tick run
+                                in the order they were added.
+    '''
+
+    def __init__(self, policy=SKIP, idle=IDLE_WFI, profiler=None, supervisor=None):
+        ''' @brief Constructs an empty scheduler
+            @param policy Overrun policy, either SKIP or CATCH_UP
+            @param idle Idle mode used between deadlines, IDLE_NONE, IDLE_WFI or IDLE_SLEEP
+            @param profiler Optional profiler.Profiler that times every task run
+            @param supervisor Optional supervisor.Supervisor told the busy time of every pass
+        '''
+        ## @brief Function to get time in ms
+        self.getTime = utime.ticks_ms
+        ## @brief Function to get time in us, used for profiling and pass busy time
+        self.getTime_us = utime.ticks_us
+        ## @brief Function to take time difference
+        self.tdif = utime.ticks_diff
+        ## @brief Function to add an offset to a ticks value
+        self.tadd = utime.ticks_add
+        ## @brief Overrun policy
+        self.policy = policy
+        ## @brief Idle mode used between deadlines
+        self.idle = idle
+        ## @brief Optional profiler timing every task run
+        self.profiler = profiler
+        ## @brief Optional load shedding supervisor told the busy time of every pass
+        self.supervisor = supervisor
+        ## @brief Registered task objects
+        self.tasks = []
+        ## @brief Bound update methods of the registered tasks
+        self.callbacks = []
+        ## @brief Phase offset of each task in ms
+        self.offsets = []
+        ## @brief Next deadline of each task in ticks_ms
+        self.deadlines = []
+        ## @brief The same deadlines in ticks_us, anchored to the ms tick by start() and kept in step with deadlines
+        #         so the profiler gets lateness in us
+        self.deadlines_us = []
+
+    def add(self, task, offset=0, name=None):
+        ''' @brief Registers a task with the scheduler
+            @param task Object with a period attribute in ms and an update() method
+            @param offset Phase offset in ms of the first run relative to start()
+            @param name Name of the task in the profiler table
+            @return Index of the task in the scheduler
+        '''
+        if self.profiler is not None:
+            self.profiler.add(name if name else 'task{}'.format(len(self.tasks)))
+        self.tasks.append(task)
+        self.callbacks.append(task.update)
+        self.offsets.append(offset)
+        self.deadlines.append(self.tadd(self.getTime(), offset))
+        self.deadlines_us.append(self.tadd(self.getTime_us(), offset*1000))
+        return len(self.tasks) - 1
+
+    def start(self):
+        ''' @brief Aligns every task's first deadline to a common start time plus its offset
+            @details Waits for the next ms tick before reading both clocks, up to 1 ms once at start up, so the us
+                     deadlines sit on the ms boundaries tasks are dispatched at rather than somewhere inside the ms.
+        '''
+        m0 = self.getTime()
+        while self.tdif(self.getTime(), m0) == 0:
+            pass
+        t0 = self.getTime()
+        t0_us = self.getTime_us()
+        for n in range(len(self.tasks)):
+            self.deadlines[n] = self.tadd(t0, self.offsets[n])
+            self.deadlines_us[n] = self.tadd(t0_us, self.offsets[n]*1000)
+
+    def run_once(self):
+        ''' @brief Runs every task that is due, then idles until the nearest deadline
+            @return Time in ms that was spent idling, 0 when no task is registered
+        '''
+        if not self.tasks:
+            return 0
+        t_pass = self.getTime_us()
+        now = self.getTime()
+        for n in range(len(self.tasks)):
+            late = self.tdif(now, self.deadlines[n])
+            if late >= 0:
+                if self.profiler is None:
+                    self.callbacks[n]()
+                else:
+                    t_start = self.getTime_us()
+                    self.callbacks[n]()
+                    self.profiler.record(n, t_start, self.tdif(self.getTime_us(), t_start),
+                                         self.tdif(t_start, self.deadlines_us[n]), self.tasks[n].period*1000)
+                period = self.tasks[n].period
+                steps = late//period + 1 if self.policy == SKIP else 1
+                self.deadlines[n] = self.tadd(self.deadlines[n], period*steps)
+                self.deadlines_us[n] = self.tadd(self.deadlines_us[n], period*steps*1000)
+                now = self.getTime()
+
+        if self.supervisor is not None:
+            self.supervisor.pass_done(self.tdif(self.getTime_us(), t_pass))
+
+        # Sleep until the earliest of all deadlines, a negative wait means a task is still behind (CATCH_UP burst)
+        # (a loop rather than min() over a list so the pass allocates nothing)
+        wait = self.tdif(self.deadlines[0], now)
+        for deadline in self.deadlines:
+            dt = self.tdif(deadline, now)
+            if dt < wait:
+                wait = dt
+        if wait > 0:
+            self.sleep(wait)
+            return wait
+        return 0
+
+    def sleep(self, wait):
+        ''' @brief Idles for wait ms using the configured idle mode
+            @param wait Time in ms until the next deadline
+        '''
+        if self.idle == IDLE_WFI:
+            wake = self.tadd(self.getTime(), wait)
+            while self.tdif(wake, self.getTime()) > 0:
+                pyb.wfi()
+        elif self.idle == IDLE_SLEEP:
+            utime.sleep_ms(wait)
+        else:
+            wake = self.tadd(self.getTime(), wait)
+            while self.tdif(wake, self.getTime()) > 0:
+                pass
+
+    def run(self):
+        ''' @brief Starts the schedule and runs it forever
+        '''
+        self.start()
+        while (True):
+            self.run_once()
@@ -0,0 +1,169 @@
+'''@file share_monitor.py
+    @brief Access statistics and staleness monitoring for the term project shares.
+    @details A ShareMonitor wraps a Share, ShareMotorInfo, ArrayShare or SeqShare and is passed to the tasks in its
+             place. It counts reads and writes, records the ticks_us time of the last write of every field, and keeps
+             the worst and latest age of the data at the moment a consumer reads it. A consumer reading far more often
+             than the producer writes, or acting on data older than one producer period, shows up directly in the
+             report, so rate mismatches between producer and consumer pairs and stale inputs to the control path can
+             be found on the rig. Task_User prints every monitor with the m command. The wrapper adds a few us per
+             access, so main.py only wraps the shares when MONITOR_SHARES is set.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+import utime
+
+## @brief Marks a read() or write() call without a field index, as used by Share
+_NO_IDX = object()
+
+
+class ShareMonitor:
+    ''' @brief                  Counting and timing wrapper around a share
+        @details                read() and write() take the same arguments as the wrapped share, with the field index
+                                left out for a plain Share. write_from() counts as a write of every field, and
+                                read_into(), readall() and a read_if_newer() that returns data count as a read of every
+                                field. Any other attribute such as stamp() or seq is passed through.
+    '''
+
+    def __init__(self, share, name, fields=1):
+        ''' @brief Wraps a share
+            @param share Share object to monitor
+            @param name Name printed in the report
+            @param fields Number of fields of the share, 1 for a plain Share
+        '''
+        ## @brief Wrapped share
+        self.share = share
+        ## @brief Name printed in the report
+        self.name = name
+        ## @brief Number of reads
+        self.reads = 0
+        ## @brief Number of writes
+        self.writes = 0
+        ## @brief Time of the last write of every field in ticks_us
+        self.t_write = array.array('l', [utime.ticks_us()]*fields)
+        ## @brief Age of the data at the last read in us
+        self.age_last = 0
+        ## @brief Worst age of the data at a read in us
+        self.age_max = 0
+        ## @brief Time of the first access in ticks_ms, for the access rates in the report
+        self.t0 = utime.ticks_ms()
+
+    def __getattr__(self, attr):
+        ''' @brief Passes every attribute the monitor does not define through to the wrapped share
+            @param attr Name of the attribute
+        '''
+        return getattr(self.share, attr)
+
+    def write(self, idx, item=_NO_IDX):
+        ''' @brief Writes to the wrapped share and records the write time of the field
+            @param idx Field index, or the new value for a plain Share
+            @param item New value of the field
+        '''
+        self.writes += 1
+        if item is _NO_IDX:
+            self.share.write(idx)
+            self.t_write[0] = utime.ticks_us()
+        else:
+            self.share.write(idx, item)
+            self.t_write[idx] = utime.ticks_us()
+
+    def write_from(self, values):
+        ''' @brief Writes every field of the wrapped share from an array and records the write time of all fields
+            @param values Array holding the new values
+        '''
+        self.writes += 1
+        self.share.write_from(values)
+        now = utime.ticks_us()
+        for n in range(len(self.t_write)):
+            self.t_write[n] = now
+
+    def read(self, idx=_NO_IDX):
+        ''' @brief Reads from the wrapped share and records the age of the field
+            @param idx Field index, left out for a plain Share
+            @return The value of the share or field
+        '''
+        if idx is _NO_IDX:
+            self._age(0)
+            return self.share.read()
+        self._age(idx)
+        return self.share.read(idx)
+
+    def read_into(self, buffer):
+        ''' @brief Copies every field into the caller's array, recording the age of the oldest field
+            @param buffer Array of the same type and length to copy into
+            @return Value returned by the wrapped share
+        '''
+        self._age(self._oldest())
+        return self.share.read_into(buffer)
+
+    def read_if_newer(self, last_seq, buffer=None):
+        ''' @brief Checks the wrapped share for new data, counting a read when it returns data
+            @details A plain Share always returns the value with a new sequence number, an ArrayShare or SeqShare
+                     only copies the fields when buffer is given, so only those calls count as a read.
+            @param last_seq Sequence number the consumer saw last
+            @param buffer Optional array the new sample is copied into, not taken by a plain Share
+            @return Value returned by the wrapped share
+        '''
+        if buffer is None:
+            result = self.share.read_if_newer(last_seq)
+            if isinstance(result, tuple):
+                self._age(self._oldest())
+            return result
+        result = self.share.read_if_newer(last_seq, buffer)
+        if result is not None:
+            self._age(self._oldest())
+        return result
+
+    def readall(self):
+        ''' @brief Reads every field, recording the age of the oldest field
+            @return Tuple of all fields
+        '''
+        self._age(self._oldest())
+        return self.share.readall()
+
+    def _oldest(self):
+        ''' @brief Finds the field written longest ago
+            @return Index of the field
+        '''
+        now = utime.ticks_us()
+        oldest = 0
+        for n in range(1, len(self.t_write)):
+            if utime.ticks_diff(now, self.t_write[n]) > utime.ticks_diff(now, self.t_write[oldest]):
+                oldest = n
+        return oldest
+
+    def _age(self, idx):
+        ''' @brief Counts a read and updates the age statistics
+            @param idx Field that was read
+        '''
+        self.reads += 1
+        age = utime.ticks_diff(utime.ticks_us(), self.t_write[idx])
+        self.age_last = age
+        if age > self.age_max:
+            self.age_max = age
+
+    def reset(self):
+        ''' @brief Clears the counts and the worst age, the write times are kept
+        '''
+        self.reads = 0
+        self.writes = 0
+        self.age_max = 0
+        self.t0 = utime.ticks_ms()
+
+
+def report(monitors):
+    '''@brief Prints the access counts, rates and data ages of every monitor
+        @details Reads per write well above one means the consumer polls faster than the producer publishes, well
+                 below one means samples are overwritten before anyone reads them.
+        @param monitors Sequence of ShareMonitor objects
+    '''
+    print("Share           Reads  Writes  Reads/s  Writes/s  Reads/write  LastAge(us)  MaxAge(us)")
+    for m in monitors:
+        t = utime.ticks_diff(utime.ticks_ms(), m.t0)/1000
+        if t <= 0:
+            t = 1
+        print("{:<12}{:>9}{:>8}{:>9.0f}{:>10.0f}{:>13.2f}{:>13}{:>12}".format(
+              m.name, m.reads, m.writes, m.reads/t, m.writes/t, m.reads/m.writes if m.writes else 0,
+              m.age_last, m.age_max))
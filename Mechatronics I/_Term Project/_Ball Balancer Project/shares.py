@@ -4,6 +4,87 @@
                 multiple tasks.
 '''
 
+import array
+import pyb
+import utime
+
+## @brief Sequence numbers wrap at this mask so they stay small ints
+SEQ_MASK = 0x3FFFFFFF
+
+## Ball share (Task_TP) field indices
+## @brief Index reference for ball x position (mm)
+BALL_X = 0
+## @brief Index reference for ball y position (mm)
+BALL_Y = 1
+## @brief Index reference for ball x velocity (mm/s)
+BALL_VX = 2
+## @brief Index reference for ball y velocity (mm/s)
+BALL_VY = 3
+## @brief Index reference for contact flag, 1 when something touches the panel
+BALL_Z = 4
+## @brief Index reference for time since the previous scan (s)
+BALL_DT = 5
+## @brief Number of fields in the ball share
+BALL_SIZE = 6
+
+## IMU share (Task_IMU) field indices
+## @brief Index reference for platform angle about x (rad)
+IMU_THX = 0
+## @brief Index reference for platform angular velocity about x (rad/s)
+IMU_THXD = 1
+## @brief Index reference for platform angle about y (rad)
+IMU_THY = 2
+## @brief Index reference for platform angular velocity about y (rad/s)
+IMU_THYD = 3
+## @brief Number of fields in the IMU share
+IMU_SIZE = 4
+
+## Duty share (Task_Controller to Task_Motor) field indices
+## @brief Index reference for motor 1 duty (% PWM)
+DUTY_1 = 0
+## @brief Index reference for motor 2 duty (% PWM)
+DUTY_2 = 1
+## @brief Number of fields in the duty share
+DUTY_SIZE = 2
+
+## State share (Task_Controller to Task_User and Task_Data) field indices
+## @brief Index reference for ball x position (mm)
+STATE_X = 0
+## @brief Index reference for ball x velocity (mm/s)
+STATE_XDOT = 1
+## @brief Index reference for ball y position (mm)
+STATE_Y = 2
+## @brief Index reference for ball y velocity (mm/s)
+STATE_YDOT = 3
+## @brief Index reference for platform angle about x (rad)
+STATE_THX = 4
+## @brief Index reference for platform angular velocity about x (rad/s)
+STATE_THXD = 5
+## @brief Index reference for platform angle about y (rad)
+STATE_THY = 6
+## @brief Index reference for platform angular velocity about y (rad/s)
+STATE_THYD = 7
+## @brief Index reference for motor 1 duty (% PWM)
+STATE_D1 = 8
+## @brief Index reference for motor 2 duty (% PWM)
+STATE_D2 = 9
+## @brief Number of fields in the state share
+STATE_SIZE = 10
+
+## Mode share (Task_User) field indices
+## @brief Index reference for the motor mode, 0 idle and 1 balancing
+MODE = 0
+## @brief Number of fields in the mode share
+MODE_SIZE = 1
+
+## @brief Names and sizes of the shares allocated from one Region, in memory order
+LAYOUT = (('ball', BALL_SIZE),
+          ('imu', IMU_SIZE),
+          ('duty', DUTY_SIZE),
+          ('state', STATE_SIZE),
+          ('mode', MODE_SIZE))
+
+
 class ShareMotorInfo:
     ''' @brief      A standard shared variable.
         @details    Values can be accessed with read() or changed with write()
@@ -36,9 +117,313 @@ class ShareMotorInfo:
     
     
 
+class ArrayShare:
+    ''' @brief      A shared vector of numbers stored in a preallocated array.
+        @details    Fields are accessed by index with read() and changed in
+                    place with write(), using the field index references
+                    above. The array is allocated once, so producers updating
+                    it every period do not create new lists or tuples for
+                    the garbage collector. Consumers that want every field at
+                    once copy them into their own array with read_into().
+                    A producer calls stamp() once it has written a complete
+                    sample (write_from() stamps by itself), which increments
+                    the sequence number seq and records the write time for
+                    read_if_newer() and age().
+    '''
+    def __init__(self, size, typecode='f', buffer=None):
+        ''' @brief      Constructs a shared vector of zeros
+            @param      size Number of fields in the share
+            @param      typecode Array typecode of the fields, float by default
+            @param      buffer Optional memoryview of an existing array to
+                        keep the fields in, used by Region
+        '''
+        self._buffer = array.array(typecode, [0]*size) if buffer is None else buffer
+        ## @brief      Sequence number, incremented by every stamp()
+        self.seq = 0
+        ## @brief      Time of the last stamp() in ticks_us
+        self.t_write = utime.ticks_us()
+    
+    def stamp(self):
+        ''' @brief      Marks the fields written so far as a new sample
+        '''
+        self.seq = (self.seq + 1) & SEQ_MASK
+        self.t_write = utime.ticks_us()
+    
+    def write(self, idx, item):
+        ''' @brief      Updates one field of the shared vector
+            @param idx  Index of the field
+            @param item The new value for the field
+        '''
+        self._buffer[idx] = item
+        
+    def read(self, idx):
+        ''' @brief      Access one field of the shared vector
+            @param idx  Index of the field
+            @return     The value of the field
+        '''
+        return self._buffer[idx]
+    
+    def write_from(self, values):
+        ''' @brief      Updates every field from an array of the same type
+            @param values Array holding the new values
+        '''
+        self._buffer[0:len(self._buffer)] = values
+        self.stamp()
+    
+    def read_into(self, buffer):
+        ''' @brief      Copies every field into the caller's array
+            @param buffer Array of the same type and length to copy into
+            @return     Sequence number of the copied sample
+        '''
+        buffer[0:len(self._buffer)] = self._buffer
+        return self.seq
+    
+    def read_if_newer(self, last_seq, buffer=None):
+        ''' @brief      Checks for a sample stamped since last_seq
+            @param last_seq Sequence number the consumer saw last
+            @param buffer Optional array the new sample is copied into
+            @return     The new sequence number, or None when nothing new
+                        has been stamped
+        '''
+        if self.seq == last_seq:
+            return None
+        if buffer is not None:
+            buffer[0:len(self._buffer)] = self._buffer
+        return self.seq
+    
+    def age(self):
+        ''' @brief      Time since the last stamp()
+            @return     Age of the sample in us
+        '''
+        return utime.ticks_diff(utime.ticks_us(), self.t_write)
+    
+    def readall(self):
+        ''' @brief      Access every field, allocating a new tuple
+            @return     Tuple of all fields
+        '''
+        return tuple(self._buffer)
+    
+    def __len__(self):
+        ''' @brief      Number of fields in the shared vector
+        '''
+        return len(self._buffer)
+    
+    
+class SeqShare(ArrayShare):
+    ''' @brief      An ArrayShare that an interrupt can publish samples to.
+        @details    Uses a seqlock so a producer running in a pyb.Timer or
+                    pin callback never waits and a reader never disables
+                    interrupts. The sequence number is odd while a sample is
+                    being written: the first write() after a stamp() makes it
+                    odd and stamp() makes it even again. read_into() copies
+                    the fields and retries when the sequence number was odd
+                    or changed during the copy, so x from one scan is never
+                    paired with y from the next. Nothing is allocated on
+                    either side as long as the producer writes numbers that
+                    do not allocate, so an ISR should use an integer typecode
+                    (for example raw ADC counts) because float arithmetic
+                    allocates on the heap.
+                    Retrying only ends when the writer can preempt the reader,
+                    so a reader in interrupt context with a producer in the
+                    main loop gives up after a few tries and gets None.
+    '''
+    def __init__(self, size, typecode='f', buffer=None, tries=4):
+        ''' @brief      Constructs a shared vector of zeros
+            @param      size Number of fields in the share
+            @param      typecode Array typecode of the fields, float by default
+            @param      buffer Optional memoryview of an existing array to
+                        keep the fields in, used by Region
+            @param      tries Number of copies read_into() attempts before
+                        giving up
+        '''
+        super().__init__(size, typecode, buffer)
+        ## @brief      Number of copies read_into() attempts before giving up
+        self.tries = tries
+        ## @brief      Number of reads that had to be repeated
+        self.retries = 0
+    
+    def write(self, idx, item):
+        ''' @brief      Updates one field, opening a new sample if needed
+            @param idx  Field index reference such as BALL_X
+            @param item The new value for the field
+        '''
+        if not self.seq & 1:
+            self.seq += 1
+        self._buffer[idx] = item
+    
+    def stamp(self):
+        ''' @brief      Publishes the fields written so far as one sample
+        '''
+        self.seq = (self.seq + (1 if self.seq & 1 else 2)) & SEQ_MASK
+        self.t_write = utime.ticks_us()
+    
+    def write_from(self, values):
+        ''' @brief      Publishes every field from an array as one sample
+            @param values Array holding the new values
+        '''
+        if not self.seq & 1:
+            self.seq += 1
+        self._buffer[0:len(self._buffer)] = values
+        self.stamp()
+    
+    def read_into(self, buffer):
+        ''' @brief      Copies a consistent sample into the caller's array
+            @param buffer Array of the same type and length to copy into
+            @return     Sequence number of the copied sample, or None when
+                        every try overlapped a write, in which case the
+                        contents of buffer are undefined and must not be
+                        used
+        '''
+        for n in range(self.tries):
+            seq = self.seq
+            if not seq & 1:
+                buffer[0:len(self._buffer)] = self._buffer
+                if self.seq == seq:
+                    return seq
+            self.retries += 1
+        return None
+    
+    def read_if_newer(self, last_seq, buffer=None):
+        ''' @brief      Checks for a sample published since last_seq
+            @param last_seq Sequence number the consumer saw last
+            @param buffer Optional array a consistent copy of the new sample
+                        is written to
+            @return     The new sequence number, or None when nothing new
+                        has been published or no consistent copy was made
+        '''
+        seq = self.seq & ~1
+        if seq == last_seq:
+            return None
+        if buffer is not None:
+            return self.read_into(buffer)
+        return seq
+
+class Region:
+    ''' @brief      One contiguous array that every ArrayShare is allocated from.
+        @details    The fields of all shares in the layout sit back to back
+                    in a single float array, each share getting a memoryview
+                    slice of it. A logger grabs every share at once with
+                    snapshot(), a single slice copy that no scheduled
+                    callback can interrupt, and write() passes the raw bytes
+                    straight to a file or stream. Shares created as SeqShare
+                    keep their seqlock: snapshot() only keeps a copy taken
+                    while none of them had a sample open and none published
+                    a new one, otherwise it retries like
+                    SeqShare.read_into(). The fields of plain ArrayShares are
+                    copied as they are. The byte layout is
+                    published in layout and fmt so a host can decode a record
+                    with struct.unpack(fmt, record). Field indices within a
+                    share are the index references above, so field STATE_X
+                    of the 'state' share is at find('state')[1] + STATE_X of
+                    the record.
+    '''
+    def __init__(self, layout=LAYOUT, typecode='f', tries=4):
+        ''' @brief      Allocates the region, zeroed
+            @param      layout Tuple of (name, size) pairs in memory order
+            @param      typecode Array typecode of every field, float by
+                        default
+            @param      tries Number of copies snapshot() attempts before
+                        giving up
+        '''
+        ## @brief      Tuple of (name, offset, size) of every share, offsets
+        #              in fields
+        self.layout = []
+        n = 0
+        for (name, size) in layout:
+            self.layout.append((name, n, size))
+            n += size
+        self.layout = tuple(self.layout)
+        ## @brief      The array holding every share's fields
+        self.buffer = array.array(typecode, [0]*n)
+        ## @brief      Preallocated copy filled by snapshot()
+        self.snap = array.array(typecode, [0]*n)
+        ## @brief      struct format of one snapshot record, little endian
+        self.fmt = '<{:}{:}'.format(n, typecode)
+        ## @brief      SeqShares created from the region, checked by
+        #              snapshot()
+        self.guarded = []
+        ## @brief      Sequence numbers of the guarded shares at the start
+        #              of a snapshot
+        self.seqs = array.array('l')
+        ## @brief      Number of copies snapshot() attempts before giving up
+        self.tries = tries
+        ## @brief      Number of snapshots that had to be repeated
+        self.retries = 0
+    
+    def find(self, name):
+        ''' @brief      Looks up a share in the layout
+            @param      name Name of the share in the layout
+            @return     Tuple of the name, offset of the first field in a
+                        record and number of fields
+        '''
+        for entry in self.layout:
+            if entry[0] == name:
+                return entry
+        raise KeyError(name)
+    
+    def share(self, name, cls=ArrayShare):
+        ''' @brief      Creates the share backed by the named part of the region
+            @param      name Name of the share in the layout
+            @param      cls ArrayShare or SeqShare
+            @return     New share object
+        '''
+        (_, start, size) = self.find(name)
+        share = cls(size, buffer=memoryview(self.buffer)[start:start + size])
+        if isinstance(share, SeqShare):
+            self.guarded.append(share)
+            self.seqs.append(0)
+        return share
+    
+    def snapshot(self):
+        ''' @brief      Copies every share into snap in one slice assignment
+            @details    The copy is repeated when a SeqShare had a sample
+                        open or published a new one meanwhile.
+            @return     The snap array, or None when every try overlapped a
+                        write of a SeqShare
+        '''
+        guarded = self.guarded
+        seqs = self.seqs
+        for n in range(self.tries):
+            ok = True
+            for i in range(len(guarded)):
+                seqs[i] = guarded[i].seq
+                if seqs[i] & 1:
+                    ok = False
+            if ok:
+                self.snap[:] = self.buffer
+                for i in range(len(guarded)):
+                    if guarded[i].seq != seqs[i]:
+                        ok = False
+                if ok:
+                    return self.snap
+            self.retries += 1
+        return None
+    
+    def write(self, stream):
+        ''' @brief      Writes one snapshot record to a file or stream
+            @param      stream Object with a write() method taking a buffer
+            @return     True when a consistent record was written, False
+                        when snapshot() gave up and nothing was written
+        '''
+        snap = self.snapshot()
+        if snap is None:
+            return False
+        stream.write(snap)
+        return True
+    
+    def describe(self):
+        ''' @brief      Layout as text, for example for a log file header
+            @return     String like "fmt=<23f ball:0:6 imu:6:4 ..."
+        '''
+        return 'fmt=' + self.fmt + ''.join(' {:}:{:}:{:}'.format(*f) for f in self.layout)
+
 class Share:
     ''' @brief      A standard shared variable.
         @details    Values can be accessed with read() or changed with write()
+                    Every write() increments the sequence number seq and
+                    records the write time, so a consumer can skip data it
+                    has already seen with read_if_newer() and check how old
+                    the value is with age().
     '''
     def __init__(self, initial_value=None):
         ''' @brief      Constructs a shared variable
@@ -46,45 +431,175 @@ class Share:
                                       shared variable.
         '''
         self._buffer = initial_value
+        ## @brief      Sequence number, incremented by every write
+        self.seq = 0
+        ## @brief      Time of the last write in ticks_us
+        self.t_write = utime.ticks_us()
     
     def write(self, item):
         ''' @brief      Updates the value of the shared variable
             @param item The new value for the shared variable
         '''
         self._buffer = item
+        self.seq = (self.seq + 1) & SEQ_MASK
+        self.t_write = utime.ticks_us()
         
     def read(self):
         ''' @brief      Access the value of the shared variable
             @return    The value of the shared variable
         '''
         return self._buffer
+    
+    def read_if_newer(self, last_seq):
+        ''' @brief      Access the value only if it was written since last_seq
+            @param last_seq Sequence number the consumer saw last
+            @return     Tuple of the new sequence number and the value, or
+                        None when nothing new has been written
+        '''
+        if self.seq == last_seq:
+            return None
+        return (self.seq, self._buffer)
+    
+    def age(self):
+        ''' @brief      Time since the last write
+            @return     Age of the value in us
+        '''
+        return utime.ticks_diff(utime.ticks_us(), self.t_write)
 
 class Queue:
-    ''' @brief      A queue of shared data.
+    ''' @brief      A fixed capacity ring buffer queue of shared data.
         @details    Values can be accessed with placed into queue with put() or
                     removed from the queue with get(). Check if there are
                     items in the queue with num_in() before using get().
+                    The buffer is allocated once in the constructor and never
+                    grows, like the C++ Queue in ME507-Support taskqueue.h.
+                    When the queue is full put() either rejects the new item
+                    and returns False (default, as in taskqueue.h) or, in
+                    overwrite mode, drops the oldest item. put() does not
+                    allocate and only moves the head index, so it is safe to
+                    call from an interrupt handler while the main loop calls
+                    get(). In overwrite mode put() also moves the tail, so the
+                    reading methods briefly disable interrupts.
     '''
-    def __init__(self):
+    def __init__(self, size=32, typecode=None, overwrite=False):
         ''' @brief              Constructs an empty queue of shared values
+            @param size         Maximum number of items held in the queue
+            @param typecode     Optional array typecode (e.g. 'f' or 'h'); the
+                                items are then stored in an array instead of
+                                a list of object references
+            @param overwrite    True to overwrite the oldest item when full,
+                                False to reject the newest item
         '''
-        self._buffer = []
+        # One slot is always left empty to tell a full queue from an empty one
+        if typecode is None:
+            self._buffer = [None]*(size + 1)
+        else:
+            self._buffer = array.array(typecode, [0]*(size + 1))
+        self._len = size + 1
+        self._head = 0
+        self._tail = 0
+        self._overwrite = overwrite
+        ## @brief      Highest number of items that has been in the queue
+        self.max_full = 0
     
     def put(self, item):
         ''' @brief      Adds an item to the end of the queue.
+            @details    Safe to call from an interrupt handler, nothing is
+                        allocated.
             @param item The new item to append to the queue.
+            @return     True if the item was queued, False if the queue was
+                        full and the item was rejected
         '''
-        self._buffer.append(item)
+        head = self._head + 1
+        if head == self._len:
+            head = 0
+        if head == self._tail:
+            if not self._overwrite:
+                return False
+            tail = self._tail + 1
+            self._tail = 0 if tail == self._len else tail
+        self._buffer[self._head] = item
+        self._head = head
+        n = self.num_in()
+        if n > self.max_full:
+            self.max_full = n
+        return True
         
     def get(self):
         ''' @brief      Remove the first item from the front of the queue
             @return     The value of the item removed
         '''
-        return self._buffer.pop(0)
+        if self._overwrite:
+            irq = pyb.disable_irq()
+        if self._head == self._tail:
+            if self._overwrite:
+                pyb.enable_irq(irq)
+            raise IndexError('get from empty queue')
+        item = self._buffer[self._tail]
+        tail = self._tail + 1
+        self._tail = 0 if tail == self._len else tail
+        if self._overwrite:
+            pyb.enable_irq(irq)
+        return item
+    
+    def get_into(self, buffer):
+        ''' @brief      Removes as many items as fit into a buffer
+            @details    Copies items from the front of the queue into the
+                        caller's list or array without allocating.
+            @param buffer List or array to fill from index 0
+            @return     The number of items copied
+        '''
+        if self._overwrite:
+            irq = pyb.disable_irq()
+        n = 0
+        tail = self._tail
+        while n < len(buffer) and tail != self._head:
+            buffer[n] = self._buffer[tail]
+            n += 1
+            tail += 1
+            if tail == self._len:
+                tail = 0
+        self._tail = tail
+        if self._overwrite:
+            pyb.enable_irq(irq)
+        return n
+    
+    def peek(self):
+        ''' @brief      Return the first item without removing it
+            @return     The value of the item at the front of the queue
+        '''
+        if self._overwrite:
+            irq = pyb.disable_irq()
+        if self._head == self._tail:
+            if self._overwrite:
+                pyb.enable_irq(irq)
+            raise IndexError('peek from empty queue')
+        item = self._buffer[self._tail]
+        if self._overwrite:
+            pyb.enable_irq(irq)
+        return item
     
     def num_in(self):
         ''' @brief      Find the number of items in the queue. Call before get().
             @return     The number of items in the queue
         '''
-        return len(self._buffer)
+        n = self._head - self._tail
+        return n + self._len if n < 0 else n
     
+    def any(self):
+        ''' @brief      Check if there is at least one item in the queue
+            @return     True if the queue is not empty
+        '''
+        return self._head != self._tail
+    
+    def full(self):
+        ''' @brief      Check if the queue is full
+            @return     True if the next put() rejects or overwrites an item
+        '''
+        return self.num_in() == self._len - 1
+    
+    def available(self):
+        ''' @brief      Find the number of free slots in the queue
+            @return     The number of items that can be put before it is full
+        '''
+        return self._len - 1 - self.num_in()
@@ -0,0 +1,97 @@
+'''@file supervisor.py
+    @brief Load shedding supervisor for the term project loop.
+    @details Measures how long every scheduler pass keeps the CPU busy. When a pass takes more than a set fraction of
+             the control period, the 3 ms control deadline is at risk and the supervisor starts shedding: low
+             priority work such as Task_User display redraws and Task_Data file appends asks allow() first and is
+             deferred while shedding is on. Once enough passes in a row finish well inside the budget the deferred
+             work is allowed again. Shed and resume events and every deferral are counted so report() shows how
+             often logging competes with balancing.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+
+import array
+
+
+class Supervisor:
+    ''' @brief                  Defers low priority work while the control deadline is at risk
+        @details                Low priority consumers register once with add() and call allow() with their index
+                                before doing deferrable work. The scheduler reports the busy time of every pass with
+                                pass_done().
+    '''
+
+    def __init__(self, budget, high=0.8, low=0.5, hold=100, size=4):
+        ''' @brief Constructs a supervisor that is not shedding
+            @param budget Time budget of one pass in ms, the control period
+            @param high Fraction of the budget above which shedding starts
+            @param low Fraction of the budget below which a pass counts as having slack
+            @param hold Number of passes in a row with slack before deferred work resumes
+            @param size Maximum number of low priority consumers
+        '''
+        ## @brief Busy time in us above which shedding starts
+        self.high = int(budget*1000*high)
+        ## @brief Busy time in us below which a pass has slack
+        self.low = int(budget*1000*low)
+        ## @brief Number of passes in a row with slack before deferred work resumes
+        self.hold = hold
+        ## @brief True while low priority work is being deferred
+        self.shedding = False
+        ## @brief Number of passes in a row with slack
+        self.slack = 0
+        ## @brief Worst pass busy time seen in us
+        self.busy_max = 0
+        ## @brief Number of times shedding started
+        self.shed_events = 0
+        ## @brief Number of times deferred work resumed
+        self.resume_events = 0
+        ## @brief Names of the low priority consumers
+        self.names = []
+        ## @brief Number of times each consumer was deferred
+        self.deferred = array.array('l', [0]*size)
+
+    def add(self, name):
+        ''' @brief Registers a low priority consumer
+            @param name Name printed in the report
+            @return Index passed to allow()
+        '''
+        self.names.append(name)
+        return len(self.names) - 1
+
+    def pass_done(self, busy):
+        ''' @brief Updates the shedding state from the busy time of one scheduler pass
+            @param busy Time in us the pass spent running tasks
+        '''
+        if busy > self.busy_max:
+            self.busy_max = busy
+        if busy > self.high:
+            self.slack = 0
+            if not self.shedding:
+                self.shedding = True
+                self.shed_events += 1
+        elif self.shedding:
+            if busy < self.low:
+                self.slack += 1
+                if self.slack >= self.hold:
+                    self.shedding = False
+                    self.resume_events += 1
+            else:
+                self.slack = 0
+
+    def allow(self, n):
+        ''' @brief Asks whether a low priority consumer may do its work now
+            @param n Index of the consumer returned by add()
+            @return False while shedding, the call is then counted as deferred
+        '''
+        if self.shedding:
+            self.deferred[n] += 1
+            return False
+        return True
+
+    def report(self):
+        ''' @brief Prints shed and resume events and deferral counts
+        '''
+        print("Shedding: {:}, shed events: {:}, resume events: {:}, worst pass: {:}us (limit {:}us)".format(
+              self.shedding, self.shed_events, self.resume_events, self.busy_max, self.high))
+        for n in range(len(self.names)):
+            print("{:<16}{:>8} deferred".format(self.names[n], self.deferred[n]))
@@ -9,9 +9,45 @@
 '''
 
 import utime
+import array
 import tp
+import cal_rls
 from ulab import numpy as np
 import os
+import struct
+from shares import BALL_X, BALL_Y, BALL_VX, BALL_VY, BALL_Z, BALL_DT
+
+## @brief ADC samples averaged per axis when the calibration file does not give a count, 1 is a single ADC.read()
+#         per axis as before oversampling was added, a larger count on the file's second line opts in to it
+DEFAULT_SAMPLES = 1
+
+## @brief Refines the calibration with the 9 reference touches at start up and saves it when True
+REFINE_CAL = False
+## @brief Scans streamed into the estimator at every reference touch of refineCal()
+REFINE_SCANS = 20
+## @brief Positions in mm of the 9 calibration touches, in the order of prompt
+CAL_POINTS = ((-88,-50),(-88,0),(-88, 50),(0,50),(0,0),(0,-50),(88,-50),(88,0),(88,50))
+
+## @brief File raw samples are written to by saveCapture(), read by host/replay_tp.py
+CAPTURE_FILE = "tp_capture.bin"
+## @brief Samples recorded by one capture
+CAPTURE_SAMPLES = 2000
+## @brief Capture file header: magic, calibration coefficients Kxx Kxy Kyx Kyy xc yc and number of samples
+CAPTURE_HEADER = '<4s6fI'
+## @brief One captured sample: X, Y and Z ADC counts and scan time in ticks_us
+CAPTURE_FMT = '<HHHI'
+## @brief Bytes per captured sample
+CAPTURE_SIZE = struct.calcsize(CAPTURE_FMT)
+
+## @brief File holding the nonlinear correction grid measured by calibrateGrid()
+GRID_FILE = "RT_cal_grid.txt"
+## @brief Runs the dense grid calibration at start up when GRID_FILE does not exist yet
+DENSE_CAL = False
+## @brief Correction grid size and node positions in mm (columns, rows, x of first node, y of first node, x step,
+#         y step), 5 by 5 nodes spanning the same area as the 9 point calibration
+GRID_SIZE = (5, 5, -88, -50, 44, 25)
+## @brief Scans averaged at every grid calibration point
+GRID_SCANS = 20
 
 ## @brief Prompt for calibrating touch panel
 prompt = ['Touch Left Bottom (Origin)', 
@@ -30,11 +66,23 @@ class Task_TP:
         @details Collects IMU data and checks for calibration coefficients
     '''
     
-    def __init__(self,Share):
+    def __init__(self,period,Share,offset=0,split=False,estimator=None):
         '''@brief Initial conditions when running touch panel task
             @details Instantiates touch panel object, sets initial conditions of ball position and velocity,
                      calibrates touch panel, and sets up share object.
+            @param period Period in ms at which the panel is scanned, matched to the controller period
+            @param Share shares.ArrayShare that ball position and velocity are written to in place
+            @param offset Phase offset in ms of the scan within the period, used to keep it off the IMU's I2C tick
+            @param split True to do one non-blocking step of the scan per period instead of a whole scan, the period
+                         is then the time between steps and a sample with contact takes three periods
+            @param estimator Optional kalman.CVKalman gain table used instead of the alpha-beta filter
         '''
+        ## @brief Period in ms at which the panel is scanned
+        self.period = period
+        ## @brief Phase offset in ms of the scan within the period
+        self.offset = offset
+        ## @brief Time adjusts once clock reaches the period value plus the current time
+        self.next_time = utime.ticks_add(utime.ticks_ms(), period + offset)
         ## @brief Sets up touch panel driver to obtain methods
         self.tp = tp.TouchPanel()
         ## @brief Function to get time
@@ -47,22 +95,55 @@ class Task_TP:
         self.T_s = 0
         ## @brief Initial time
         self.t0 = self.getTime()
+        ## @brief X, Y and Z ADC counts of the last scan, filled in place by the driver
+        self.raw = array.array('H', [0, 0, 0])
+        ## @brief Calibrated x and y position of the last scan in mm
+        self.pos = array.array('f', [0, 0])
         
         (self.xcur,self.ycur,self.zcur,self.Vxcur,self.Vycur,self.t0) = (0,0,False,0,0,0)
         
+        # Settle times tuned for this panel by tune_tp.py, the driver defaults otherwise, loaded first so
+        # the calibrations scan with them too
+        if tp.SETTLE_FILE in os.listdir():
+            with open(tp.SETTLE_FILE, 'r') as f:
+                self.tp.setSettle([int(value) for value in f.readline().strip().split(',')])
         ## @brief Gets calibration coefficient values
         calV = self.getCalCoef()
         self.tp.setCalV(calV)
+        ## @brief Recursive least squares estimator refining the calibration coefficients from reference touches
+        self.rls = cal_rls.CalRLS(calV)
+        if REFINE_CAL:
+            self.refineCal()
+        # Nonlinear correction on top of the affine calibration, when one has been measured
+        self.getCalGrid()
+        # Oversample as far as the scan time budget allows
+        self.samples = self.tp.setOversample(self.samples)
         
         ## @brief Sets up share object
         self.Share = Share
+        ## @brief True when every update does one TouchPanel.step() instead of a whole scan
+        self.split = split
+        ## @brief Steady state Kalman gain table, None to use the alpha-beta filter
+        self.kf = estimator
+        
+        ## @brief Raw sample buffer of the capture mode, allocated by startCapture()
+        self.cap_buf = None
+        ## @brief Number of samples recorded so far
+        self.cap_n = 0
+        ## @brief Number of samples the current capture records, 0 when not capturing
+        self.cap_len = 0
         
     def getCalCoef(self):
         '''@brief Gets calibration coefficients
             @details Checks a file for calibration coefficients, if it is not there then task runs through calibrating
                     touch panel to find coefficients.
+                     The optional second line of the file is the number of ADC samples averaged per axis, it is
+                     read into samples and written with DEFAULT_SAMPLES after a new calibration. Files without it
+                     keep the single ADC.read() per axis.
             @return cal_values are the 6 calibration values
         '''
+        ## @brief ADC samples averaged per axis, from the second line of the calibration file
+        self.samples = DEFAULT_SAMPLES
         ## @brief Name of file that will be searched for on flashdrive or that will be created if not there.
         filename = "RT_cal_coeffs.txt"
         if filename in os.listdir():
@@ -71,6 +152,9 @@ class Task_TP:
                 cal_string = f.readline()
                 ## @brief Split the line into multiple strings and then convert each one to a float
                 cal_values = tuple([float(cal_value) for cal_value in cal_string.strip().split(',')])
+                samples_string = f.readline().strip()
+                if samples_string:
+                    self.samples = int(samples_string)
         else:
             with open(filename, 'w') as f:
                 # Perform manual calibration
@@ -80,9 +164,139 @@ class Task_TP:
                 # as a string. The example uses an f-string, but you can
                 # use string.format() if you prefer
                 f.write(f"{Kxx}, {Kxy}, {Kyx}, {Kyy}, {Xc}, {Yc}\r\n")
+                f.write(f"{DEFAULT_SAMPLES}\r\n")
                 
         return cal_values    
 
+    def refine(self, x_act, y_act):
+        '''@brief Refines the calibration with the last scan, taken while the ball or a finger was at a known spot
+            @param x_act Known x position in mm
+            @param y_act Known y position in mm
+            @return Distance in mm between the known position and the position before the update, None without
+                    contact
+        '''
+        if not self.zcur:
+            return None
+        err = self.rls.update(self.raw[0], self.raw[1], x_act, y_act)
+        self.tp.setCalV(self.rls.coefficients())
+        return err
+    
+    def refineCal(self):
+        '''@brief Refines the calibration from the 9 reference touches and saves it
+            @details Every scan while a point is touched is streamed into the estimator, so no matrix is built or
+                     inverted however many scans are taken.
+        '''
+        raw = self.raw
+        for n in range(len(CAL_POINTS)):
+            (x_act, y_act) = CAL_POINTS[n]
+            while self.tp.scan(raw):
+                pass
+            print(prompt[n])
+            while not self.tp.scan(raw):
+                pass
+            self.wait(200000)
+            taken = 0
+            while taken < REFINE_SCANS:
+                if self.tp.scan(raw):
+                    err = self.rls.update(raw[0], raw[1], x_act, y_act)
+                    taken += 1
+            print('REMOVE HAND NOW!!!! error before refinement {:.2f}mm'.format(err))
+        self.tp.setCalV(self.rls.coefficients())
+        self.saveCal()
+    
+    def saveCal(self):
+        '''@brief Writes the refined calibration coefficients and the sample count back to the calibration file
+        '''
+        with open("RT_cal_coeffs.txt", 'w') as f:
+            f.write(", ".join(map(str, self.rls.coefficients())) + "\r\n")
+            f.write(f"{self.samples}\r\n")
+    
+    def startCapture(self, samples=CAPTURE_SAMPLES):
+        '''@brief Starts recording the raw ADC counts of every sample, before calibration and filtering
+            @details The buffer is allocated here, or reused from the last capture, so recording only packs the
+                     counts into it. Once it is full, saveCapture() writes it to flash.
+            @param samples Number of samples to record
+        '''
+        if self.cap_buf is None or len(self.cap_buf) < samples*CAPTURE_SIZE:
+            self.cap_buf = bytearray(samples*CAPTURE_SIZE)
+        self.cap_n = 0
+        self.cap_len = samples
+    
+    def captureDone(self):
+        '''@brief Checks whether a capture has filled its buffer and is waiting to be saved
+            @return True when saveCapture() should be called
+        '''
+        return self.cap_len > 0 and self.cap_n >= self.cap_len
+    
+    def saveCapture(self, filename=CAPTURE_FILE):
+        '''@brief Writes the captured samples to flash and ends the capture
+            @details The file starts with CAPTURE_HEADER holding the calibration coefficients the capture ran with,
+                     followed by one CAPTURE_FMT record per sample. Takes long enough that it should be called from a
+                     low priority task such as Task_User, not from the touch panel tick.
+            @param filename Name of the file to write
+        '''
+        panel = self.tp
+        with open(filename, 'wb') as f:
+            f.write(struct.pack(CAPTURE_HEADER, b'TPC1', panel.Kxx, panel.Kxy, panel.Kyx, panel.Kyy, panel.xc, panel.yc,
+                                self.cap_n))
+            f.write(memoryview(self.cap_buf)[0:self.cap_n*CAPTURE_SIZE])
+        self.cap_len = 0
+    
+    def getCalGrid(self):
+        '''@brief Loads the correction grid into the touch panel driver
+            @details Reads GRID_FILE if it exists. Otherwise, when DENSE_CAL is set, runs calibrateGrid() and writes
+                     the result to the file. The first line of the file holds the grid size and node positions, the
+                     second and third lines the x and y corrections in mm at every node, row by row.
+        '''
+        if GRID_FILE in os.listdir():
+            with open(GRID_FILE, 'r') as f:
+                size = tuple([float(value) for value in f.readline().strip().split(',')])
+                size = (int(size[0]), int(size[1])) + size[2:]
+                grid_x = array.array('f', [float(value) for value in f.readline().strip().split(',')])
+                grid_y = array.array('f', [float(value) for value in f.readline().strip().split(',')])
+            self.tp.setGrid(size, grid_x, grid_y)
+        elif DENSE_CAL:
+            (grid_x, grid_y) = self.calibrateGrid()
+            self.tp.setGrid(GRID_SIZE, grid_x, grid_y)
+            with open(GRID_FILE, 'w') as f:
+                f.write(", ".join(map(str, GRID_SIZE)) + "\r\n")
+                f.write(", ".join(map(str, grid_x)) + "\r\n")
+                f.write(", ".join(map(str, grid_y)) + "\r\n")
+    
+    def calibrateGrid(self):
+        '''@brief Measures the nonlinear error of the affine calibration on a dense grid of points
+            @details The user touches every node of GRID_SIZE in turn. At every node GRID_SCANS scans are averaged and
+                     the difference between the node position and the affine position is the correction at that
+                     node. Must run before a correction grid is set, so the scans are affine only.
+            @return Tuple of array('f') x and y corrections in mm at every node, row by row
+        '''
+        (cols, rows, x0, y0, xstep, ystep) = GRID_SIZE
+        grid_x = array.array('f', [0]*(cols*rows))
+        grid_y = array.array('f', [0]*(cols*rows))
+        for j in range(rows):
+            for i in range(cols):
+                x_act = x0 + i*xstep
+                y_act = y0 + j*ystep
+                while self.tp.getScan()[2]:
+                    pass
+                print('Touch x = {:}mm, y = {:}mm'.format(x_act, y_act))
+                while not self.tp.getScan()[2]:
+                    pass
+                self.wait(200000)
+                (x_sum, y_sum, n) = (0, 0, 0)
+                while n < GRID_SCANS:
+                    (x, y, z) = self.tp.getScan()
+                    if z:
+                        x_sum += x
+                        y_sum += y
+                        n += 1
+                grid_x[j*cols + i] = x_act - x_sum/n
+                grid_y[j*cols + i] = y_act - y_sum/n
+                print('REMOVE HAND NOW!!!!')
+        print(grid_x)
+        print(grid_y)
+        return (grid_x, grid_y)
+
     def calibrate(self):
         '''@brief Calibrates touch panel
             @details Uses actual measurements on touch panel with respect to the center and compares what is measured
@@ -94,7 +308,7 @@ class Task_TP:
         ## @brief Sets up array for ADC values
         ADC_vals = np.ones((9,2))
         ## @brief Array of real world platform values for corresponding touch test
-        X_act = np.array([[-88,-50],[-88,0],[-88, 50],[0,50],[0,0],[0,-50],[88,-50],[88,0],[88,50]])
+        X_act = np.array(CAL_POINTS)
         ## @brief Counter for running through calibration
         n = 0
         r = False
@@ -128,11 +342,26 @@ class Task_TP:
     def contactPoint(self):
         '''@brief Updates current x and y position/velocity, and if something is pressing the platform
             @details Uses alpha beta filtering to update positions and velocity over some time period. Resets position and
-                    velocity when the ball is not on the platform.
+                    velocity when the ball is not on the platform. With an estimator the steady state Kalman gains of
+                    the measured sample period are used instead.
+            @return False when a split scan has not finished a sample yet and nothing was updated
         '''
-        (x,y,z) = self.tp.getScan()
+        if self.split:
+            z = self.tp.step(self.raw)
+            if z is None:
+                return False
+        else:
+            z = self.tp.scan(self.raw)
+        if z:
+            self.tp.position(self.raw, self.pos)
+            x = self.pos[0]
+            y = self.pos[1]
         self.T_s = self.tdif(self.getTime(),self.t0)/1E6
         self.t0 = self.getTime()
+        if self.cap_n < self.cap_len:
+            raw = self.raw
+            struct.pack_into(CAPTURE_FMT, self.cap_buf, self.cap_n*CAPTURE_SIZE, raw[0], raw[1], raw[2], self.t0)
+            self.cap_n += 1
         if not self.zcur and z:
             ## @brief Current x position
             self.xcur = x
@@ -144,6 +373,21 @@ class Task_TP:
             self.Vycur = 0
             ## @brief Current condition if something is pressing platform
             self.zcur = z
+        elif z and self.kf is not None:
+            # Constant velocity Kalman filter: predict, then correct with the steady state gains of the period
+            kf = self.kf
+            n = kf.index(self.T_s)
+            k1 = kf.k1[n]
+            k2 = kf.k2[n]
+            xp = self.xcur + self.T_s*self.Vxcur
+            yp = self.ycur + self.T_s*self.Vycur
+            ex = x - xp
+            ey = y - yp
+            self.xcur = xp + k1*ex
+            self.ycur = yp + k1*ey
+            self.Vxcur += k2*ex
+            self.Vycur += k2*ey
+            
         elif z:
             ## @brief Alpha filter
             alpha = 0.85
@@ -162,12 +406,27 @@ class Task_TP:
             self.Vxcur = 0
             self.ycur  = 0
             self.Vycur = 0
+        return True
+            
+    def run(self):
+        '''@brief Updates the ball position and velocity once the period has elapsed
+        '''
+        if (utime.ticks_diff(utime.ticks_ms(), self.next_time) >= 0):
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
             
     def update(self):
         '''@brief Updates position and velocity of ball and writes values to a share
         '''
-        self.contactPoint()
-        self.Share.write((self.xcur,self.ycur,self.Vxcur,self.Vycur,self.zcur,self.T_s))
+        if not self.contactPoint():
+            return
+        self.Share.write(BALL_X, self.xcur)
+        self.Share.write(BALL_Y, self.ycur)
+        self.Share.write(BALL_VX, self.Vxcur)
+        self.Share.write(BALL_VY, self.Vycur)
+        self.Share.write(BALL_Z, self.zcur)
+        self.Share.write(BALL_DT, self.T_s)
+        self.Share.stamp()
         
     
     
\ No newline at end of file
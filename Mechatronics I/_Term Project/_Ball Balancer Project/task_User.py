@@ -8,6 +8,9 @@
 '''
 
 import utime
+import array
+import share_monitor
+from shares import STATE_X, STATE_Y, STATE_THX, STATE_THY, STATE_D1, STATE_D2, STATE_SIZE, MODE
 
 ## @brief State 0 variable, Initializing state.
 S0_INIT = 0
@@ -22,7 +25,8 @@ class Task_User:
     '''
    
     
-    def __init__(self,period, Mode_Control_Share, State_Share, collectStatus, CommReader):
+    def __init__(self,period, Mode_Control_Share, State_Share, collectStatus, CommReader, profiler=None,
+                 supervisor=None, monitors=(), tpTask=None):
 
         ''' 
         @brief              Constructs an user task object
@@ -32,14 +36,21 @@ class Task_User:
         @param              Mode_Control_Share controls control tasks mode tasks mode 0 being Ideal 1 is balance 
         @param              State_Share contains all the current variables to discribe the state
         @param              collectStatus controls the data collect task
-        @param              CommReader Communication reader between PuTTY and Nucleo board so user can type commands
+        @param              CommReader Communication reader between PuTTY and Nucleo board so user can type commands,
+                            None when keys are passed to write() directly
+        @param              profiler Optional profiler whose task timing table is printed with the t command
+        @param              supervisor Optional load shedding supervisor that can defer display redraws, its counts are
+                            printed with the l command
+        @param              monitors Optional share monitors whose access counts and data ages are printed with the m
+                            command
+        @param              tpTask Optional touch panel task whose raw samples are captured with the r command
         '''
         ## @brief gets time in ms
         self.Time = utime.ticks_ms
         ## @brief Defines period as what is called in main for period parameter
         self.period = period
         ## @brief Time adjusts once clock reaches the period value plus the current time
-        self.next_time = period + self.Time()        
+        self.next_time = utime.ticks_add(self.Time(), period)
         ## @brief discribes current state
         self.State = S0_INIT
         
@@ -47,6 +58,8 @@ class Task_User:
         self.mode_Share = Mode_Control_Share
         ## @brief Contains all the current variables to discribe the state
         self.state_Share = State_Share
+        ## @brief Copy of one state sample so the display never mixes fields of two control updates
+        self.st = array.array('f', [0]*STATE_SIZE)
         ## @brief Controls the data collect task
         self.collect_Status = collectStatus
         ## @brief Communication reader between PuTTY and Nucleo board so user can type commands
@@ -54,6 +67,21 @@ class Task_User:
         
         ## @brief if 1 continues to print data
         self.displayP = 0
+        
+        ## @brief Task timing profiler printed with the t command
+        self.profiler = profiler
+        ## @brief Load shedding supervisor deferring display redraws while the control deadline is at risk
+        self.supervisor = supervisor
+        if supervisor is not None:
+            ## @brief Index of the display redraw in the supervisor
+            self.shed_idx = supervisor.add('User redraw')
+        ## @brief Share monitors printed with the m command
+        self.monitors = monitors
+        ## @brief Touch panel task recording raw samples with the r command
+        self.tpTask = tpTask
+        if supervisor is not None and tpTask is not None:
+            ## @brief Index of the capture file write in the supervisor
+            self.shed_cap = supervisor.add('Capture save')
                 
     def run(self):
         ''' 
@@ -64,30 +92,45 @@ class Task_User:
         '''
 
         # If the current time passes next time (time to update) then next update is utilized to obtain encoder position and delta
-        if (self.Time() >= self.next_time):
+        if (utime.ticks_diff(self.Time(), self.next_time) >= 0):
             
-            self.next_time += self.period
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
+    
+    def update(self):
+        ''' 
+        @brief      Runs one period of the user task without checking the time
+        @details    Prints the user interface in the initial state, otherwise reads and handles one key command.
+                    A finished touch panel capture is written to flash here, away from the touch panel tick.
+        '''
+        if self.tpTask is not None and self.tpTask.captureDone() and (self.supervisor is None
+                                                                     or self.supervisor.allow(self.shed_cap)):
+            self.tpTask.saveCapture()
+            print("touch panel capture saved")
+        if (self.State == S0_INIT):
+            #Print user interface
+            print("\033c", end="")
+            print("_________USER COMMANDS INTERFACE_________\n\n"
+                  "p:       Print out the position of the ball and the angle of the platform\n"
+                  "P:       Toggels print display\n"
+                  "g:       Collect data and print it as a comma separated list\n"
+                  "s:       End data collection prematurely and print\n"
+                  "t:       Print task timing table (execution time, jitter, deadline misses)\n"
+                  "l:       Print load shedding counts\n"
+                  "m:       Print share access counts and data age\n"
+                  "r:       Record raw touch panel samples to tp_capture.bin\n"
+                  "_________________________________________\n"
+                  "enter:   Toggle motors from on to off\n"
+                  "esc  :   Redisplay user command interface")
             
-            if (self.State == S0_INIT):
-                #Print user interface
-                print("\033c", end="")
-                print("_________USER COMMANDS INTERFACE_________\n\n"
-                      "p:       Print out the position of the ball and the angle of the platform\n"
-                      "P:       Toggels print display\n"
-                      "g:       Collect data and print it as a comma separated list\n"
-                      "s:       End data collection prematurely and print\n"
-                      "_________________________________________\n"
-                      "enter:   Toggle motors from on to off\n"
-                      "esc  :   Redisplay user command interface")
-                
 
-                self.transition_to(S1_WAIT_FOR_KEYINPUT)
-            elif self.State == S1_WAIT_FOR_KEYINPUT:
-                ## @brief Stores returned key command from read function
-                keyCommand = self.read()
-                self.write(keyCommand[0])
-            
-            
+            self.transition_to(S1_WAIT_FOR_KEYINPUT)
+        elif self.State == S1_WAIT_FOR_KEYINPUT:
+            ## @brief Stores returned key command from read function
+            keyCommand = self.read()
+            self.write(keyCommand[0])
+        
+        
     def write(self,keyCommand):
         ''' 
         @brief              Baised on a user command this code will interact with the rest of the shares
@@ -99,12 +142,21 @@ class Task_User:
         
         
 
-        if self.displayP or keyCommand == b'p'[0]:
-            (x,xd,y,yd,thx,thxd,thy,thyd,D1,D2) = self.state_Share.read()
-            print("\033c_________State Data Display_________\n\n"
-                  "Ball    :    x   = {:.2f}mm,\t\ty   = {:.2f}mm\n"
-                  "Platform:    thx = {:.2E}rad,\t\tthy = {:.2E}rad\n"
-                  "Duty    :    D1 = {:.2f}%,\t\tD2 = {:.2f}%\n\n".format(x,y,thx,thy,D1,D2),end="")
+        # continuous display redraws are deferred while the supervisor sheds load, a p command always prints
+        if keyCommand == b'p'[0] or (self.displayP and (self.supervisor is None
+                                                        or self.supervisor.allow(self.shed_idx))):
+            st = self.st
+            if self.state_Share.read_into(st) is None:
+                # every copy overlapped a control update, the buffer may mix two samples so it is not shown
+                if keyCommand == b'p'[0]:
+                    print("State share busy, press p again")
+            else:
+                print("\033c_________State Data Display_________\n\n"
+                      "Ball    :    x   = {:.2f}mm,\t\ty   = {:.2f}mm\n"
+                      "Platform:    thx = {:.2E}rad,\t\tthy = {:.2E}rad\n"
+                      "Duty    :    D1 = {:.2f}%,\t\tD2 = {:.2f}%\n\n".format(st[STATE_X],st[STATE_Y],
+                                                                       st[STATE_THX],st[STATE_THY],
+                                                                       st[STATE_D1],st[STATE_D2]),end="")
             
         # Goes back to State 0 the initial state when the esc key is hit
         if keyCommand == b'\x1b'[0]:
@@ -121,19 +173,50 @@ class Task_User:
         # stops recording 
         elif keyCommand == b's'[0]: 
             self.collect_Status.read()[1] = -1 
+        # prints task timing table
+        elif keyCommand == b't'[0]:
+            if self.profiler is not None:
+                print("\033c_________Task Timing_________\n")
+                self.profiler.report()
+            else:
+                print("Task timing profiler is not enabled")
+        # prints load shedding counts
+        elif keyCommand == b'l'[0]:
+            if self.supervisor is not None:
+                self.supervisor.report()
+            else:
+                print("Load shedding supervisor is not enabled")
+        # records raw touch panel samples
+        elif keyCommand == b'r'[0]:
+            if self.tpTask is not None:
+                self.tpTask.startCapture()
+                print("recording touch panel samples")
+            else:
+                print("Touch panel capture is not enabled")
+        # prints share access counts and data age
+        elif keyCommand == b'm'[0]:
+            if self.monitors:
+                share_monitor.report(self.monitors)
+                for m in self.monitors:
+                    m.reset()
+            else:
+                print("Share monitoring is not enabled, set MONITOR_SHARES in main.py")
         # toggles motor on to off   
         elif keyCommand == 13:
-            self.mode_Share.read()[0] ^= 1
-            print("Motor Mode: {:}".format(self.mode_Share.read()[0]))
+            mode = 0 if self.mode_Share.read(MODE) else 1
+            self.mode_Share.write(MODE, mode)
+            self.mode_Share.stamp()
+            print("Motor Mode: {:}".format(mode))
                      
     def read(self):     
         ''' 
         @brief              Reads serial communication between user and Nucleo
         @details            CommReader detects if any communication is being sent by the user, and if so then it is read
                             and stored as a byte with variable keyCommand. The read function then clears the queue and
-                            returns keyCommand byte value.
+                            returns keyCommand byte value. When CommReader is None (async runtime) keys are
+                            delivered to write() by a stream reader instead and this always returns a space.
         '''       
-        if(self.CommReader.any()):
+        if(self.CommReader is not None and self.CommReader.any()):
             #Reads Most recent Command
             keyCommand = self.CommReader.read(1)
             # Clears Queue
@@ -8,8 +8,10 @@
     @date       December 8, 2021
 '''
 
-from ulab import numpy as np
 import utime
+from shares import BALL_X, BALL_Y, BALL_VX, BALL_VY, IMU_THX, IMU_THXD, IMU_THY, IMU_THYD, DUTY_1, DUTY_2
+from shares import STATE_X, STATE_XDOT, STATE_Y, STATE_YDOT, STATE_THX, STATE_THXD, STATE_THY, STATE_THYD
+from shares import STATE_D1, STATE_D2, MODE
 
 
 
@@ -33,7 +35,7 @@ class Task_Controller:
         self.period = period
         self.getTime = utime.ticks_ms
         ## @brief Time adjusts once clock reaches the period value plus the current time
-        self.next_time = period + self.getTime()
+        self.next_time = utime.ticks_add(self.getTime(), period)
         ## @brief ModeShare is written in the user task to toggle the controller from Ideal to balancing
         self.Mode = ModeShare
         ## @brief BallShare reads Ball position from Tp task 
@@ -50,15 +52,30 @@ class Task_Controller:
         
         
         # Controller Data
-        ## @brief Kp1 is the motor controller
-        self.Kp1 = np.array([[-1.09,-.84,-690, 5]])
-        ## @brief Kp2 is the motor2 controller
-        self.Kp2 = np.array([[-1.34,-.86,-690, 5]])
+        ## @brief Kp1 is the motor controller, gains on x, xdot, theta y and theta y dot
+        self.Kp1 = (-1.09,-.84,-690, 5)
+        ## @brief Kp2 is the motor2 controller, gains on y, ydot, theta x and theta x dot
+        self.Kp2 = (-1.34,-.86,-690, 5)
         
         ## @brief D1C is the saved motor 1 duty from the previous run which will be incremented in the run task
         self.D1c = 0
         ## @brief D2C is the saved motor 2 duty from the previous run which will be incremented in the run task
         self.D2c = 0
+        ## @brief Motor 1 duty the output is incremented towards
+        self.D1 = 0
+        ## @brief Motor 2 duty the output is incremented towards
+        self.D2 = 0
+        
+        ## @brief Sequence number of the last ball sample used, -1 so the first sample counts as new
+        self.ball_seq = -1
+        ## @brief Sequence number of the last IMU sample used
+        self.imu_seq = -1
+        ## @brief Age of the ball sample in us when the last update ran
+        self.ball_age = 0
+        ## @brief Age of the IMU sample in us when the last update ran
+        self.imu_age = 0
+        ## @brief Number of updates that found no new sensor sample and reused the duty targets
+        self.stale = 0
         
         R = 2.21 # oms
         Kt = 13.8
@@ -73,54 +90,98 @@ class Task_Controller:
                             When in balance mode the platform uses the current states and K to balance to get the torques and duties
                             then the coutput duty is incromented to prevent motor slippage
         '''
-        if (self.getTime() >= self.next_time):
-            self.next_time += self.period
-            
+        if (utime.ticks_diff(self.getTime(), self.next_time) >= 0):
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
+    
+    def update(self):
+        ''' 
+        @brief              Runs one period of the controller without checking the time
+        @details            Called by run() once the period has elapsed, or directly by the scheduler which keeps
+                            track of the period itself.
+        '''
+        ball = self.Ball_Data
+        imu = self.IMU_Data
+        st = self.State_S
+        
+        self.ball_age = ball.age()
+        self.imu_age = imu.age()
+        
+        # Only rebuild the state and torques when a sensor has produced a new sample
+        new = False
+        seq = ball.read_if_newer(self.ball_seq)
+        if seq is not None:
+            self.ball_seq = seq
+            new = True
+        seq = imu.read_if_newer(self.imu_seq)
+        if seq is not None:
+            self.imu_seq = seq
+            new = True
+        
+        if new:
             # Get State Data
-            (x,y,xdot,ydot,z,dt) = self.Ball_Data.read()
-            (th_x, thd_x, th_y, thd_y) = self.IMU_Data.read()
+            x = ball.read(BALL_X)
+            y = ball.read(BALL_Y)
+            xdot = ball.read(BALL_VX)
+            ydot = ball.read(BALL_VY)
+            th_x = imu.read(IMU_THX)
+            thd_x = imu.read(IMU_THXD)
+            th_y = imu.read(IMU_THY)
+            thd_y = imu.read(IMU_THYD)
             
-            # Ideal Mode
-            if self.Mode.read()[0] == 0:
-                self.D1c = 0
-                self.D2c = 0
-                
-            # Balance Mode  
-            else:
-                # Build States
-                q1 = np.array([[x],[xdot],[th_y],[thd_y]])
-                q2 = np.array([[y],[ydot],[th_x],[thd_x]])
-                
-                # Torques Proportional
-                Tp1 =  np.dot(-self.Kp1,q1)[0,0]
-                Tp2 = -np.dot(-self.Kp2,q2)[0,0]
-                
-                # Duty
-                D1 = self.C*Tp1
-                D2 = self.C*Tp2
-                
-                # Increment Duty
-                inc = 5
-                if self.D1c + inc < D1:
-                    self.D1c += inc
-                elif self.D1c - inc > D1:
-                    self.D1c -= inc
-                else:
-                    self.D1c = D1
-                    
-                if self.D2c + inc < D2:
-                    self.D2c += inc
-                elif self.D2c - inc > D2:
-                    self.D2c -= inc
-                else:
-                    self.D2c = D2
+            # Torques Proportional, T = -K q written out so no state vectors are allocated
+            (K1, K2, K3, K4) = self.Kp1
+            Tp1 = -(K1*x + K2*xdot + K3*th_y + K4*thd_y)
+            (K1, K2, K3, K4) = self.Kp2
+            Tp2 =  (K1*y + K2*ydot + K3*th_x + K4*thd_x)
+            
+            # Duty
+            self.D1 = self.C*Tp1
+            self.D2 = self.C*Tp2
             
-            # Write Duty
-            self.Duty_S.write((self.D1c,self.D2c))
-        
             # System States
-            self.State_S.write([x,xdot,y, ydot,th_x, thd_x, th_y, thd_y,self.D1c,self.D2c])
+            st.write(STATE_X, x)
+            st.write(STATE_XDOT, xdot)
+            st.write(STATE_Y, y)
+            st.write(STATE_YDOT, ydot)
+            st.write(STATE_THX, th_x)
+            st.write(STATE_THXD, thd_x)
+            st.write(STATE_THY, th_y)
+            st.write(STATE_THYD, thd_y)
+        else:
+            self.stale += 1
+        
+        # Ideal Mode
+        if self.Mode.read(MODE) == 0:
+            self.D1c = 0
+            self.D2c = 0
+            
+        # Balance Mode, the duty is incremented every period even without new samples
+        else:
+            D1 = self.D1
+            D2 = self.D2
             
+            # Increment Duty
+            inc = 5
+            if self.D1c + inc < D1:
+                self.D1c += inc
+            elif self.D1c - inc > D1:
+                self.D1c -= inc
+            else:
+                self.D1c = D1
                 
+            if self.D2c + inc < D2:
+                self.D2c += inc
+            elif self.D2c - inc > D2:
+                self.D2c -= inc
+            else:
+                self.D2c = D2
+        
+        # Write Duty
+        self.Duty_S.write(DUTY_1, self.D1c)
+        self.Duty_S.write(DUTY_2, self.D2c)
+        self.Duty_S.stamp()
         
-            
\ No newline at end of file
+        st.write(STATE_D1, self.D1c)
+        st.write(STATE_D2, self.D2c)
+        st.stamp()
@@ -8,11 +8,15 @@
 '''
 
 import utime
+import array
+from shares import STATE_SIZE
 
 ## @brief State 0 variable, waiting state.
 S0_WAIT = 0
 ## @brief State 1 variable, record state.
 S1_RECORD = 1
+## @brief Buffered lines after which a file append is forced even while the supervisor is shedding load
+MAX_LINES = 250
     
 class Task_Data:
     ''' @brief                  Task data records and prints data
@@ -20,13 +24,16 @@ class Task_Data:
                                 the recorded for a specified amount of time then prints 
     '''
 
-    def __init__(self,period, collectStatus, State_Share):
+    def __init__(self,period, collectStatus, State_Share, supervisor=None, region=None):
 
         ''' 
         @brief              Constructs an data task object
         @details            Instantiates period all variables periab and data record values
         @param              State_Share contains all the current variables to discribe the state
         @param              collectStatus controls the data how and what is collected
+        @param              supervisor Optional load shedding supervisor that can defer file appends
+        @param              region Optional shares.Region holding State_Share, every row is then taken from one
+                            Region.snapshot() of all shares and the header describes the record layout
         '''
         self.getTime = utime.ticks_ms
         
@@ -35,7 +42,7 @@ class Task_Data:
         ## @brief current run period
         self.period = period
         ## @brief Time adjusts once clock reaches the period value plus the current time
-        self.next_time = period + self.getTime()
+        self.next_time = utime.ticks_add(self.getTime(), period)
         ## @brief current state
         self.state = S0_WAIT
         
@@ -44,6 +51,12 @@ class Task_Data:
         self.collect_Status = collectStatus
         ## @brief Contains all the current variables to discribe the state
         self.State_S = State_Share
+        ## @brief Copy of one state sample so a row never mixes fields of two control updates
+        self.sample = array.array('f', [0]*STATE_SIZE)
+        ## @brief Region every share is allocated from, None to copy the state share alone
+        self.region = region
+        ## @brief Record offset of the first state field in a region snapshot
+        self.state_off = region.find('state')[1] if region is not None else 0
         
         
         ## @brief record start time
@@ -59,6 +72,12 @@ class Task_Data:
         ## @brief built String
         self.data = ""
         
+        ## @brief Load shedding supervisor deferring file appends while the control deadline is at risk
+        self.supervisor = supervisor
+        if supervisor is not None:
+            ## @brief Index of the file append in the supervisor
+            self.shed_idx = supervisor.add('Data save')
+        
              
     def run(self):
         ''' 
@@ -69,45 +88,65 @@ class Task_Data:
         '''
 
         # If the current time passes next time (time to update) then next update is utilized to obtain encoder position and delta
-        if (self.getTime() >= self.next_time):
-            
-            
-            if self.state == S0_WAIT:
-                if self.collect_Status.read()[1]>0:
-                    self.period = self.collect_Status.read()[0] * 1000
-                    self.collect_Status.read()[0] = 0
-                    
-                    self.setUpData()
-                    self.t0 = self.next_time  
-                    self.record()
-                    self.transition_to(S1_RECORD)
-                    
-            elif self.state == S1_RECORD:  
+        if (utime.ticks_diff(self.getTime(), self.next_time) >= 0):
+            self.update()
+    
+    def update(self):
+        ''' 
+        @brief      Runs one period of the data task without checking the time
+        @details    The nominal time of the period is kept in next_time so recorded timestamps stay evenly spaced
+                    whether the task gates itself in run() or is called by the scheduler.
+        '''
+        if self.state == S0_WAIT:
+            if self.collect_Status.read()[1]>0:
+                self.period = int(self.collect_Status.read()[0] * 1000)
+                self.collect_Status.read()[0] = 0
                 
-                self.record() 
-                self.collect_Status.read()[1] -= self.period/1000
+                self.setUpData()
+                self.t0 = self.next_time  
+                self.record()
+                self.transition_to(S1_RECORD)
                 
-                if self.collect_Status.read()[1]<= 0 or self.collect_Status.read()[0] > 0:
-                    
-                    self.count += 100
-                    self.setUpData()
-                    self.period = self.OffPeriod
-                    self.printData()
-                    self.transition_to(S0_WAIT)
-                  
+        elif self.state == S1_RECORD:  
+            
+            self.record() 
+            self.collect_Status.read()[1] -= self.period/1000
             
-            self.next_time += self.period
+            if self.collect_Status.read()[1]<= 0 or self.collect_Status.read()[0] > 0:
+                
+                self.count += 100
+                self.setUpData()
+                self.period = self.OffPeriod
+                self.printData()
+                self.transition_to(S0_WAIT)
+              
+        
+        self.next_time = utime.ticks_add(self.next_time, self.period)
 
     def record(self):
         ''' 
         @brief      Records data baised on current state
         '''
-        t = (self.next_time-self.t0)/1000//.01/100
+        t = utime.ticks_diff(self.next_time,self.t0)/1000//.01/100
         n = 0
         b = []
+        if self.region is not None:
+            # One consistent copy of every share, a row is skipped when the state share was being written every try
+            sample = self.region.snapshot()
+            if sample is None:
+                return
+            off = self.state_off
+        else:
+            # A SeqShare returns None when every copy overlapped a write, the row is skipped as for the region
+            if self.State_S.read_into(self.sample) is None:
+                return
+            sample = self.sample
+            off = 0
         for i in self.idx:
-            b.append(self.State_S.read()[i])
+            b.append(sample[off + i])
             n+=1
+        # Last column is how old the state sample was in us, so stale rows can be spotted
+        b.append(self.State_S.age())
             
         self.saveData(t,b)
         
@@ -129,7 +168,13 @@ class Task_Data:
       
         with open("file.txt", 'a') as f:
             ## @brief Read the first line of the file
-            f.write("Data:\n")
+            # Columns of every row: time in s, the logged fields and the age of the state sample in us. With a
+            # region the fields are record offsets of its layout, without one they are state share indices
+            if self.region is not None:
+                f.write("Data: {:} cols=t,{:},age_us\n".format(self.region.describe(),
+                                                              ",".join(str(self.state_off + i) for i in self.idx)))
+            else:
+                f.write("Data: cols=t,{:},age_us\n".format(",".join(str(i) for i in self.idx)))
     
     def saveData(self,t,b):
         ''' 
@@ -140,7 +185,8 @@ class Task_Data:
         self.data += "{:}, {:}\n".format(t,d)
         self.count += 1
         
-        if self.count >50:    
+        if self.count >50 and (self.supervisor is None or self.count > MAX_LINES
+                               or self.supervisor.allow(self.shed_idx)):    
             ## @brief Name of file that will be searched for on flashdrive or that will be created if not there.
             with open("file.txt", 'a') as f:
                 
@@ -10,6 +10,7 @@
 '''
 import pyb
 import utime
+from shares import DUTY_1, DUTY_2
 
 pinB4 = pyb.Pin(pyb.Pin.cpu.B4)
 pinB5 = pyb.Pin(pyb.Pin.cpu.B5)
@@ -38,7 +39,7 @@ class Task_Motor:
         ## @brief Defines period as what is called in main for period parameter
         self.period = period
         ## @brief Time adjusts once clock reaches the period value plus the current time
-        self.next_time = period + utime.ticks_ms()
+        self.next_time = utime.ticks_add(utime.ticks_ms(), period)
 
         ## @brief Shares duty values to motars
         self.duty_shares = duty_shares       
@@ -57,14 +58,18 @@ class Task_Motor:
         '''
 
         # If the current time passes next time (time to update) then next update is utilized to obtain encoder position and delta
-        if (utime.ticks_ms() >= self.next_time):
+        if (utime.ticks_diff(utime.ticks_ms(), self.next_time) >= 0):
                     
-            self.next_time += self.period
-            
-            (d1, d2) = self.duty_shares.read()
-            self.motor1.set_duty(d1) 
-            self.motor2.set_duty(d2) 
-            
-            
+            self.next_time = utime.ticks_add(self.next_time, self.period)
+            self.update()
+    
+    def update(self):
+        ''' 
+        @brief      Sets both motor duties from the duty share without checking the time
+        '''
+        self.motor1.set_duty(self.duty_shares.read(DUTY_1)) 
+        self.motor2.set_duty(self.duty_shares.read(DUTY_2)) 
+        
+        
         
         
\ No newline at end of file
@@ -10,7 +10,28 @@
 
 import pyb
 import utime
+import micropython
+import array
 
+## @brief ADC reading of the Z phase above which something is touching the panel
+Z_THRESHOLD = 69
+## @brief Time in us the panel is left to settle after the pins are switched
+SETTLE_US = 4
+## @brief File next to RT_cal_coeffs.txt holding the Z, Y and X settle times in us found by tune_tp.py
+SETTLE_FILE = "RT_settle.txt"
+## @brief Index of the Z phase settle time in TouchPanel.settle
+PHASE_Z = 0
+## @brief Index of the Y phase settle time in TouchPanel.settle
+PHASE_Y = 1
+## @brief Index of the X phase settle time in TouchPanel.settle
+PHASE_X = 2
+
+## @brief Hardware timer pacing ADC.read_timed when oversampling (3 is the motor PWM, 6 the RT_MODE chain)
+ADC_TIMER = 7
+## @brief Fastest rate in Hz the timed ADC reads are paced at
+ADC_FREQ = 100000
+## @brief Longest time in us the oversampled X and Y reads of one scan may take together
+OVERSAMPLE_BUDGET_US = 600
 
 class TouchPanel:
     ''' @brief                  Interface with touch panel
@@ -50,8 +71,54 @@ class TouchPanel:
         ## @brief Wait function
         self.wait = utime.sleep_us
         
+        ## @brief ym pin object configured once for scan()
+        self.ym = pyb.Pin(self.A0)
+        ## @brief xm pin object configured once for scan()
+        self.xm = pyb.Pin(self.A1)
+        ## @brief yp pin object configured once for scan()
+        self.yp = pyb.Pin(self.A6)
+        ## @brief xp pin object configured once for scan()
+        self.xp = pyb.Pin(self.A7)
+        ## @brief Analog mode, switched to before every ADC read in scan()
+        self.analog = pyb.Pin.ANALOG
+        ## @brief ADC on xm, reads the Z phase
+        self.adc_xm = pyb.ADC(self.xm)
+        ## @brief ADC on xp, reads the Y phase
+        self.adc_xp = pyb.ADC(self.xp)
+        ## @brief ADC on ym, reads the X phase
+        self.adc_ym = pyb.ADC(self.ym)
+        # Creating the ADCs switched their pins to analog, put ym and xp back to drive the first Z phase
+        self.ym.init(self.out, value = 1)
+        self.xp.init(self.out, value = 0)
+        
         ## @brief Intial conditions for calibration coefficients
         (self.Kxx, self.Kxy, self.Kyx, self.Kyy, self.xc, self.yc) = (1,0,0,1,0,0)
+        
+        ## @brief Settle time in us of the Z, Y and X phases of scan(), indexed by PHASE_Z, PHASE_Y and PHASE_X
+        self.settle = array.array('H', [SETTLE_US]*3)
+        
+        ## @brief ADC samples averaged per X and Y phase in scan(), 1 for a single read
+        self.samples = 1
+        ## @brief True to drop the lowest and highest sample before averaging
+        self.trim = False
+        ## @brief Buffer filled by ADC.read_timed, allocated by setOversample()
+        self.buf = None
+        ## @brief Timer pacing ADC.read_timed, created by setOversample()
+        self.adc_timer = None
+        
+        ## @brief x correction in mm at every grid node, row by row, None when no correction grid is set
+        self.grid_x = None
+        ## @brief y correction in mm at every grid node
+        self.grid_y = None
+        ## @brief Grid size and node spacing (columns, rows, x of first node, y of first node, x step, y step)
+        (self.cols, self.rows, self.gx0, self.gy0, self.gxstep, self.gystep) = (0, 0, 0, 0, 1, 1)
+        ## @brief Scratch position getScan() corrects in place
+        self.pos = array.array('f', [0, 0])
+        
+        ## @brief Phase whose pins step() drove last and reads next, -1 before the first step() call
+        self.phase = -1
+        ## @brief Time step() last switched the pins in ticks_us
+        self.t_drive = 0
 
     def setCalV(self,calV):
         '''@brief Set calibration values
@@ -60,30 +127,82 @@ class TouchPanel:
         (self.Kxx, self.Kxy, self.Kyx, self.Kyy, self.xc, self.yc) = calV              
 
     
+    def setSettle(self, settle):
+        '''@brief Sets the settle time of every scan() phase, for example as found by tune_tp.py
+            @param settle Settle times in us of the Z, Y and X phases
+        '''
+        for phase in range(3):
+            self.settle[phase] = settle[phase]
+    
+    def setOversample(self, samples, trim=True):
+        '''@brief Sets how many ADC samples scan() averages per X and Y phase
+            @details The sample buffer and the pacing timer are allocated here, once. The count is reduced when the
+                     two timed reads would take longer than OVERSAMPLE_BUDGET_US at ADC_FREQ.
+            @param samples Requested number of samples per axis, 1 for a single ADC.read()
+            @param trim True to drop the lowest and highest sample before averaging, needs at least 4 samples
+            @return Number of samples per axis actually used
+        '''
+        samples = min(max(int(samples), 1), OVERSAMPLE_BUDGET_US*ADC_FREQ//2000000)
+        self.samples = samples
+        self.trim = trim and samples >= 4
+        if samples > 1:
+            self.buf = array.array('H', [0]*samples)
+            if self.adc_timer is None:
+                self.adc_timer = pyb.Timer(ADC_TIMER, freq=ADC_FREQ)
+        return samples
+    
+    @micropython.native
+    def _sample(self, adc):
+        '''@brief Reads one axis, averaging a timed burst of samples when oversampling
+            @param adc ADC object of the axis
+            @return Mean or trimmed mean of the samples as an integer count
+        '''
+        n = self.samples
+        if n == 1:
+            return adc.read()
+        buf = self.buf
+        adc.read_timed(buf, self.adc_timer)
+        total = 0
+        lo = 4095
+        hi = 0
+        for i in range(n):
+            v = buf[i]
+            total += v
+            if v < lo:
+                lo = v
+            if v > hi:
+                hi = v
+        if self.trim:
+            return (total - lo - hi)//(n - 2)
+        return total//n
+    
     @micropython.native    
     def getScan(self):
         '''@brief Scans X,Y,Z of touchpad
             @details Quick method for changing pins around to find values for x and y positions and z condition.
+                     Used by the calibrations, it waits the same per phase settle times as scan(), set by
+                     setSettle() from RT_settle.txt, so a calibration sees the panel as the running task does.
             @return Positions of ball and condition whether ball is on touch panel
         
         '''
+        settle = self.settle
         self.pin(self.A0,self.out,value = 1)
-        self.wait(4)
+        self.wait(settle[PHASE_Z])
         ## @brief ADC pin to Xm
         ADCxm = self.ADC(self.A1)
         ## @brief Z value that is true when a something touches the panel
-        z = ADCxm.read() > 69
-        self.wait(4)
+        z = ADCxm.read() > Z_THRESHOLD
+        self.wait(SETTLE_US)
         self.pin(self.A6,self.out,value = 0)
-        self.wait(4)
+        self.wait(settle[PHASE_Y])
         ## @brief Sets ADC pin to Xp
         ADCxp = self.ADC(self.A7)        
         ## @brief y value that doesn't account for calibration
         yr = ADCxp.read()
-        self.wait(4)
+        self.wait(SETTLE_US)
         self.pin(self.A1,self.out,value = 1)
         self.pin(self.A7,self.out,value = 0)
-        self.wait(4)
+        self.wait(settle[PHASE_X])
         ## @brief Sets ADC pin to Ym
         ADCym = self.ADC(self.A0)
         self.pin(self.A6,self.inn)
@@ -93,7 +212,162 @@ class TouchPanel:
         x = xr*self.Kxx+yr*self.Kxy+self.xc
         ## @brief True y position of ball  with respect to the center of the platform using calibration coefficients
         y = xr*self.Kyx+yr*self.Kyy+self.yc
+        if self.grid_x is not None:
+            pos = self.pos
+            pos[0] = x
+            pos[1] = y
+            self.correct(pos)
+            x = pos[0]
+            y = pos[1]
         return (x,y,z)
+    
+    @micropython.native
+    def scan(self, raw):
+        '''@brief Scans Z and, only when the panel is touched, X and Y without creating any objects
+            @details Uses the pin and ADC objects made in the constructor and only switches pin modes and reads the
+                     ADCs, so a scan allocates nothing on the heap. When the Z phase finds no contact the X and Y
+                     phases are skipped and raw keeps the last X and Y counts. The pins are left as the next Z phase
+                     expects them, as with getScan(). After setOversample() the X and Y counts are the (trimmed) mean
+                     of a timed burst of samples, the Z contact check stays a single read. Each phase switches its pins
+                     and then waits its own settle time before reading, see setSettle().
+            @param raw Array of at least 3 integers the X, Y and Z ADC counts are written to
+            @return True when something touches the panel
+        '''
+        wait = self.wait
+        settle = self.settle
+        # Z phase: ym high, xp low, read xm
+        self.ym.init(self.out, value = 1)
+        self.xm.init(self.analog)
+        wait(settle[PHASE_Z])
+        zr = self.adc_xm.read()
+        raw[2] = zr
+        if zr <= Z_THRESHOLD:
+            return False
+        # Y phase: ym high, yp low, read xp
+        self.yp.init(self.out, value = 0)
+        self.xp.init(self.analog)
+        wait(settle[PHASE_Y])
+        raw[1] = self._sample(self.adc_xp)
+        # X phase: xm high, xp low, read ym
+        self.xm.init(self.out, value = 1)
+        self.xp.init(self.out, value = 0)
+        self.ym.init(self.analog)
+        self.yp.init(self.inn)
+        wait(settle[PHASE_X])
+        raw[0] = self._sample(self.adc_ym)
+        return True
+    
+    @micropython.native
+    def step(self, raw):
+        '''@brief Does one read and drive step of a scan and returns without waiting for the panel to settle
+            @details Every call reads the phase whose pins the previous call switched, then switches the pins for the
+                     following phase and returns, so the settle time passes while other tasks run. A sample with
+                     contact takes three calls (Z, Y, X), a sample without contact a single call because the pins stay
+                     driven for the Z phase. When a call comes before the phase has settled it returns without reading.
+                     Do not mix with scan() or getScan(), which leave the pins in a different state.
+            @param raw Array of at least 3 integers the X, Y and Z ADC counts are written to
+            @return None while a sample is in progress, otherwise True when something touches the panel and False
+                    when nothing does
+        '''
+        phase = self.phase
+        if phase < 0:
+            self._driveZ()
+            return None
+        if utime.ticks_diff(utime.ticks_us(), self.t_drive) < self.settle[phase]:
+            return None
+        if phase == PHASE_Z:
+            zr = self.adc_xm.read()
+            raw[2] = zr
+            if zr <= Z_THRESHOLD:
+                # pins are still driven and settled for Z, the next call reads Z again
+                return False
+            # Y phase: ym high, yp low, read xp
+            self.yp.init(self.out, value = 0)
+            self.xp.init(self.analog)
+            self.phase = PHASE_Y
+            self.t_drive = utime.ticks_us()
+            return None
+        if phase == PHASE_Y:
+            raw[1] = self._sample(self.adc_xp)
+            # X phase: xm high, xp low, read ym
+            self.xm.init(self.out, value = 1)
+            self.xp.init(self.out, value = 0)
+            self.ym.init(self.analog)
+            self.yp.init(self.inn)
+            self.phase = PHASE_X
+            self.t_drive = utime.ticks_us()
+            return None
+        raw[0] = self._sample(self.adc_ym)
+        self._driveZ()
+        return True
+    
+    def _driveZ(self):
+        '''@brief Switches the pins for the Z phase of step(): ym high, xp low, read xm
+        '''
+        self.ym.init(self.out, value = 1)
+        self.xp.init(self.out, value = 0)
+        self.xm.init(self.analog)
+        self.phase = PHASE_Z
+        self.t_drive = utime.ticks_us()
+    
+    def position(self, raw, pos):
+        '''@brief Converts the X and Y counts of a scan to a calibrated position
+            @param raw Array filled by scan()
+            @param pos Array of at least 2 floats the x and y position in mm are written to
+        '''
+        xr = raw[0]
+        yr = raw[1]
+        pos[0] = xr*self.Kxx+yr*self.Kxy+self.xc
+        pos[1] = xr*self.Kyx+yr*self.Kyy+self.yc
+        if self.grid_x is not None:
+            self.correct(pos)
+    
+    def setGrid(self, size, grid_x, grid_y):
+        '''@brief Sets the correction grid applied on top of the affine calibration
+            @param size Tuple of the number of columns and rows, the x and y position of the first node and the
+                        node spacing in x and y, all positions in mm
+            @param grid_x array('f') of the x correction in mm at every node, row by row, None to remove the grid
+            @param grid_y array('f') of the y correction in mm at every node
+        '''
+        (self.cols, self.rows, self.gx0, self.gy0, self.gxstep, self.gystep) = size
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+    
+    @micropython.native
+    def correct(self, pos):
+        '''@brief Adds the bilinearly interpolated grid correction to a position in place
+            @details Finds the grid cell from the node spacing instead of searching, so the cost is the same for
+                     every position. Positions outside the grid use the nearest edge cell.
+            @param pos Array of at least 2 floats holding the affine x and y position in mm
+        '''
+        cols = self.cols
+        fx = (pos[0] - self.gx0)/self.gxstep
+        fy = (pos[1] - self.gy0)/self.gystep
+        if fx < 0:
+            fx = 0.0
+        elif fx > cols - 1:
+            fx = float(cols - 1)
+        if fy < 0:
+            fy = 0.0
+        elif fy > self.rows - 1:
+            fy = float(self.rows - 1)
+        i = int(fx)
+        if i > cols - 2:
+            i = cols - 2
+        j = int(fy)
+        if j > self.rows - 2:
+            j = self.rows - 2
+        tx = fx - i
+        ty = fy - j
+        k = j*cols + i
+        w00 = (1 - tx)*(1 - ty)
+        w10 = tx*(1 - ty)
+        w01 = (1 - tx)*ty
+        w11 = tx*ty
+        g = self.grid_x
+        pos[0] += g[k]*w00 + g[k+1]*w10 + g[k+cols]*w01 + g[k+cols+1]*w11
+        g = self.grid_y
+        pos[1] += g[k]*w00 + g[k+1]*w10 + g[k+cols]*w01 + g[k+cols+1]*w11
 
 
 
@@ -0,0 +1,127 @@
+'''@file tune_tp.py
+    @brief Finds the shortest safe settle time of every touch panel scan phase.
+    @details Sweeps the settle time TouchPanel.scan() waits after switching the pins, from 0 us up, with something
+             resting on the panel, one phase at a time: while the Z, then Y, then X phase is swept the other two keep
+             their current setting (RT_settle.txt or the driver default, with the phases already tuned taking their
+             new value). At every delay it scans a fixed number of times and prints the scan rate and the mean and
+             standard deviation of the swept phase's reading. The readings with every phase left to settle for
+             REFERENCE_US are taken as the settled values. For each phase the shortest delay from which on every
+             longer delay reads within TOLERANCE counts of the settled mean, with no more than TOLERANCE counts of
+             extra noise, is the minimum safe delay. MARGIN is added and the result is written to tp.SETTLE_FILE next to
+             RT_cal_coeffs.txt, where Task_TP picks it up on the next start. Run on the Nucleo with the panel
+             connected and the motors off.
+    @author Christian Clephan
+    @author John Bennett
+    @date   October 17, 2026
+'''
+import array
+import math
+import utime
+import tp
+
+## @brief Settle times in us swept for every phase
+DELAYS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+## @brief Settle time in us long enough for every phase to have settled
+REFERENCE_US = 50
+## @brief Scans per delay
+N = 200
+## @brief Largest shift of the mean and increase of the noise in ADC counts still counted as settled
+TOLERANCE = 3
+## @brief Safety margin in us added to the shortest settled delay
+MARGIN = 1
+## @brief Index in the scan() raw array of the reading of each phase, in PHASE_Z, PHASE_Y, PHASE_X order
+RAW_IDX = (2, 1, 0)
+
+
+def measure(panel, raw, settle):
+    '''@brief Scans N times with the given settle times
+        @param panel Touch panel driver
+        @param raw Array the scans are written to
+        @param settle Settle times in us of the Z, Y and X phases
+        @return Tuple of scans per second and a list of (mean, standard deviation) per phase, None if contact is lost
+    '''
+    panel.setSettle(settle)
+    total = [0, 0, 0]
+    square = [0, 0, 0]
+    t_scan = 0
+    for n in range(N):
+        t = utime.ticks_us()
+        z = panel.scan(raw)
+        t_scan += utime.ticks_diff(utime.ticks_us(), t)
+        if not z:
+            return None
+        for phase in range(3):
+            value = raw[RAW_IDX[phase]]
+            total[phase] += value
+            square[phase] += value*value
+    stats = []
+    for phase in range(3):
+        mean = total[phase]/N
+        stats.append((mean, math.sqrt(max(square[phase]/N - mean*mean, 0))))
+    return (N*1000000/t_scan, stats)
+
+
+def current():
+    '''@brief Settle times the panel runs with now
+        @return List of the Z, Y and X settle times in us from tp.SETTLE_FILE, the driver default when there is none
+    '''
+    try:
+        with open(tp.SETTLE_FILE, 'r') as f:
+            return [int(value) for value in f.readline().strip().split(',')]
+    except (OSError, ValueError):
+        return [tp.SETTLE_US]*3
+
+
+def tune():
+    '''@brief Runs the sweep, prints the results and writes the chosen settle times
+        @return Settle times in us of the Z, Y and X phases, None when contact was lost
+    '''
+    panel = tp.TouchPanel()
+    panel.setOversample(1)
+    raw = array.array('H', [0, 0, 0])
+    input("Rest a weight on the panel, keep it still and press enter")
+
+    ref = measure(panel, raw, (REFERENCE_US,)*3)
+    if ref is None:
+        print("Nothing is touching the panel")
+        return None
+    old = current()
+    settle = list(old)
+    for phase in range(3):
+        # sweep this phase alone, the other two stay at their current setting
+        print("\n{:} phase, the others at {:}us".format('ZYX'[phase], ', '.join(
+              str(settle[p]) for p in range(3) if p != phase)))
+        print("{:>9}{:>10}{:>16}".format('Delay(us)', 'Scans/s', 'Mean (std)'))
+        (ref_mean, ref_std) = ref[1][phase]
+        stats = []
+        for delay in DELAYS:
+            trial = list(settle)
+            trial[phase] = delay
+            result = measure(panel, raw, trial)
+            if result is None:
+                print("Contact lost at {:}us, keep the weight on the panel".format(delay))
+                return None
+            stats.append(result[1][phase])
+            print("{:>9}{:>10.0f}{:>9.1f} ({:>4.1f})".format(delay, result[0], *result[1][phase]))
+        # walk down from the longest delay until a reading is off
+        best = REFERENCE_US
+        for n in range(len(DELAYS) - 1, -1, -1):
+            (mean, std) = stats[n]
+            if abs(mean - ref_mean) > TOLERANCE or std > ref_std + TOLERANCE:
+                break
+            best = DELAYS[n] + MARGIN
+        settle[phase] = best
+
+    result = measure(panel, raw, settle)
+    before = measure(panel, raw, old)
+    print("\nSettle times Z = {:}us, Y = {:}us, X = {:}us, was {:}us, {:}us, {:}us".format(*(settle + old)))
+    if result is not None and before is not None:
+        print("{:.0f} scans/s with these settle times, {:.0f} scans/s with the old ones".format(
+              result[0], before[0]))
+    with open(tp.SETTLE_FILE, 'w') as f:
+        f.write("{:}, {:}, {:}\r\n".format(*settle))
+    return settle
+
+
+if __name__ == '__main__':
+    tune()